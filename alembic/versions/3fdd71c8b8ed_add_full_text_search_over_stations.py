@@ -0,0 +1,70 @@
+"""add full text search over stations
+
+Revision ID: 3fdd71c8b8ed
+Revises: 4d34bfc1e938
+Create Date: 2026-10-18 18:09:47.829303
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3fdd71c8b8ed"
+down_revision: Union[str, None] = "4d34bfc1e938"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# external content tables over stations.title, stations_fts matches words and prefixes,
+# stations_trigram matches parts of words for misspelled queries
+TOKENIZERS = {
+    "stations_fts": "unicode61 remove_diacritics 2",
+    "stations_trigram": "trigram",
+}
+
+
+def upgrade() -> None:
+    for table, tokenizer in TOKENIZERS.items():
+        op.execute(
+            f"""
+            CREATE VIRTUAL TABLE {table} USING fts5(
+                title, content='stations', content_rowid='pk', tokenize='{tokenizer}'
+            )
+            """
+        )
+        op.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+    inserts = " ".join(
+        f"INSERT INTO {table}(rowid, title) VALUES (new.pk, new.title);"
+        for table in TOKENIZERS
+    )
+    deletes = " ".join(
+        f"INSERT INTO {table}({table}, rowid, title) VALUES ('delete', old.pk, old.title);"
+        for table in TOKENIZERS
+    )
+    op.execute(
+        f"CREATE TRIGGER stations_fts_insert AFTER INSERT ON stations BEGIN {inserts} END"
+    )
+    op.execute(
+        f"CREATE TRIGGER stations_fts_delete AFTER DELETE ON stations BEGIN {deletes} END"
+    )
+    # the sync upserts every station, only reindex the ones whose title changed
+    op.execute(
+        f"""
+        CREATE TRIGGER stations_fts_update AFTER UPDATE OF title ON stations
+        WHEN old.title IS NOT new.title
+        BEGIN {deletes} {inserts} END
+        """
+    )
+
+
+def downgrade() -> None:
+    for trigger in (
+        "stations_fts_insert",
+        "stations_fts_delete",
+        "stations_fts_update",
+    ):
+        op.execute(f"DROP TRIGGER {trigger}")
+    for table in TOKENIZERS:
+        op.execute(f"DROP TABLE {table}")
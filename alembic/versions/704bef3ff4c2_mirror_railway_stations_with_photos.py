@@ -0,0 +1,86 @@
+"""mirror railway stations with photos
+
+Revision ID: 704bef3ff4c2
+Revises: 5cacbaa75d6a
+Create Date: 2026-10-18 17:48:58.864721
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "704bef3ff4c2"
+down_revision: Union[str, None] = "5cacbaa75d6a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the old stations table was never written to and its primary key changes, so it is recreated
+    op.drop_table("stations")
+    op.create_table(
+        "countries",
+        sa.Column("code", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("code"),
+    )
+    op.create_table(
+        "stations",
+        sa.Column("pk", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("country", sa.String(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("inactive", sa.Boolean(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("lon", sa.Float(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("short_code", sa.String(), nullable=True),
+        sa.Column("synced", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["country"],
+            ["countries.code"],
+        ),
+        sa.PrimaryKeyConstraint("pk"),
+        sa.UniqueConstraint("country", "id"),
+    )
+    op.create_table(
+        "photos",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("station_pk", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.Integer(), nullable=False),
+        sa.Column("license", sa.String(), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column("photographer", sa.String(), nullable=False),
+        sa.Column("outdated", sa.Boolean(), nullable=False),
+        sa.Column("synced", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["station_pk"],
+            ["stations.pk"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_photos_station_pk"), "photos", ["station_pk"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_photos_station_pk"), table_name="photos")
+    op.drop_table("photos")
+    op.drop_table("stations")
+    op.drop_table("countries")
+    op.create_table(
+        "stations",
+        sa.Column("country", sa.String(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("inactive", sa.Boolean(), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("lon", sa.Float(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
@@ -0,0 +1,134 @@
+"""
+Measures how long the event loop stalls while the cogs talk to SQLite.
+
+A probe coroutine sleeps for a millisecond in a loop and records how late it wakes up,
+while a number of simulated commands subscribe, list and unsubscribe channels and insert
+song requests. This is done once with a blocking Session on the event loop, like the cogs
+did before, and once with the async session factory from bot.database.database.
+
+    python -m benchmarks.database_stall --operations 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete, event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from bot.database.database import set_sqlite_pragmas
+from bot.database.models.deutschebahn import Base, RegisteredChannels
+from bot.database.models.musicplayer import Base as MusicBase, SongRequest
+from bot.metrics import Metric
+
+PROBE_INTERVAL = 0.001
+
+
+async def probe(stall: Metric, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        stall.record(max(0.0, time.perf_counter() - start - PROBE_INTERVAL))
+
+
+def request(i: int) -> SongRequest:
+    return SongRequest(
+        title=f"track {i}",
+        web_page=f"https://www.youtube.com/watch?v={i}",
+        requester_id=str(i % 50),
+        server_id=str(i % 5),
+        date=datetime.datetime.now(),
+    )
+
+
+def blocking_operation(session: Session, i: int):
+    if session.get(RegisteredChannels, i) is None:
+        session.add(RegisteredChannels(id=i))
+        session.commit()
+    session.scalars(select(RegisteredChannels)).all()
+    session.add(request(i))
+    session.commit()
+    session.execute(delete(RegisteredChannels).where(RegisteredChannels.id == i))
+    session.commit()
+
+
+async def async_operation(factory: async_sessionmaker, i: int):
+    async with factory() as session:
+        if await session.get(RegisteredChannels, i) is None:
+            session.add(RegisteredChannels(id=i))
+            await session.commit()
+    async with factory() as session:
+        (await session.scalars(select(RegisteredChannels))).all()
+    async with factory() as session:
+        session.add(request(i))
+        await session.commit()
+    async with factory() as session:
+        await session.execute(
+            delete(RegisteredChannels).where(RegisteredChannels.id == i)
+        )
+        await session.commit()
+
+
+async def run(name: str, operation, operations: int, concurrency: int):
+    stall = Metric(f"{name} event loop stall", window=1_000_000)
+    latency = Metric(f"{name} operation latency", window=operations)
+    done = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stall, done))
+    counter = iter(range(operations))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await operation(i)
+            latency.record(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    print(f"{name}: {operations} operations in {elapsed:.2f}s")
+    print(f"  {latency.summary()}")
+    print(f"  {stall.summary()}, total={stall.total * 1000:.0f}ms")
+
+
+async def main(operations: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "database.db")
+        sync_engine = create_engine(f"sqlite+pysqlite:///{path}")
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+        Base.metadata.create_all(sync_engine)
+        MusicBase.metadata.create_all(sync_engine)
+
+        # one shared session used from coroutines, like the cogs did before
+        with Session(sync_engine) as session:
+            await run(
+                "blocking session",
+                lambda i: asyncio.sleep(0, blocking_operation(session, i)),
+                operations,
+                concurrency,
+            )
+        sync_engine.dispose()
+
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+        factory = async_sessionmaker(async_engine, expire_on_commit=False)
+        await run(
+            "async session",
+            lambda i: async_operation(factory, i),
+            operations,
+            concurrency,
+        )
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.operations, args.concurrency))
@@ -0,0 +1,112 @@
+"""
+Compares the lookup time of the nearest stations of a coordinate, computing the distance to
+every station against the grid cell index used by !nearby.
+
+The stations are synthetic, clustered in Europe like the ones of the railway-stations api,
+plus a sparse share spread over the whole world.
+
+    python -m benchmarks.nearby --stations 300000 --queries 200
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.cogs.deutschebahn.geo import grid_cell, haversine, nearest_stations
+from bot.database.database import set_sqlite_pragmas
+from bot.database.models.deutschebahn import Base, Country, StationOfTheDay
+from bot.metrics import Metric
+
+
+def coordinate(rng: random.Random):
+    if rng.random() < 0.9:
+        return rng.uniform(36, 70), rng.uniform(-10, 40)
+    return rng.uniform(-60, 75), rng.uniform(-180, 180)
+
+
+def stations(count: int):
+    rng = random.Random(0)
+    synced = datetime.datetime.now()
+    for i in range(count):
+        lat, lon = coordinate(rng)
+        yield {
+            "country": "de",
+            "id": str(i),
+            "inactive": False,
+            "lat": lat,
+            "lon": lon,
+            "title": f"Bahnhof {i}",
+            "cell": grid_cell(lat, lon),
+            "synced": synced,
+        }
+
+
+async def full_scan(session, lat: float, lon: float, count: int):
+    rows = await session.execute(
+        select(StationOfTheDay.pk, StationOfTheDay.lat, StationOfTheDay.lon)
+    )
+    return sorted(
+        (haversine(lat, lon, station_lat, station_lon), pk)
+        for pk, station_lat, station_lon in rows
+    )[:count]
+
+
+async def measure(name: str, lookup, factory, queries, count: int):
+    latency = Metric(name, window=len(queries))
+    results = []
+    for lat, lon in queries:
+        async with factory() as session:
+            start = time.perf_counter()
+            results.append(await lookup(session, lat, lon, count))
+            latency.record(time.perf_counter() - start)
+    print(
+        f"{name}: median {latency.percentile(50) * 1000:.1f}ms,"
+        f" p95 {latency.percentile(95) * 1000:.1f}ms"
+    )
+    return results
+
+
+async def main(count: int, queries: int, nearest: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(directory, 'database.db')}"
+        )
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                insert(Country), [{"code": "de", "name": "Deutschland", "active": True}]
+            )
+            await connection.execute(insert(StationOfTheDay), list(stations(count)))
+
+        rng = random.Random(1)
+        points = [coordinate(rng) for _ in range(queries)]
+        scanned = await measure("full scan", full_scan, factory, points, nearest)
+        indexed = await measure(
+            "grid cell index", nearest_stations, factory, points, nearest
+        )
+        # the index has to return the same distances, apart from the max_distance cut off
+        mismatches = sum(
+            [round(distance, 6) for distance, _ in expected if distance <= 500]
+            != [round(distance, 6) for _, _, distance in found]
+            for expected, found in zip(scanned, indexed)
+        )
+        print(f"{mismatches} of {queries} lookups differ from the full scan")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nearest", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.stations, args.queries, args.nearest))
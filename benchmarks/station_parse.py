@@ -0,0 +1,107 @@
+"""
+Compares parse time and peak memory of picking a random station from a photoStationsByCountry
+response, validating the whole response into Model against validating only the picked station.
+
+Without --fixture a synthetic response shaped like the one of a large country is generated.
+A recorded response can be passed with --fixture:
+
+    python -m benchmarks.station_parse --stations 8000
+    python -m benchmarks.station_parse --fixture de.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from bot.cogs.deutschebahn.rs_api.api import reservoir_sample
+from bot.cogs.deutschebahn.rs_api.model import Model, Station
+
+
+def synthetic_response(stations: int) -> bytes:
+    rng = random.Random(0)
+    return json.dumps(
+        {
+            "licenses": [
+                {
+                    "id": "CC0",
+                    "name": "CC0 1.0 Universell (CC0 1.0)",
+                    "url": "https://creativecommons.org/publicdomain/zero/1.0/",
+                }
+            ],
+            "photoBaseUrl": "https://api.railway-stations.org/photos/",
+            "photographers": [
+                {"name": f"photographer{i}", "url": f"https://example.org/{i}"}
+                for i in range(200)
+            ],
+            "stations": [
+                {
+                    "country": "de",
+                    "id": str(i),
+                    "inactive": rng.random() < 0.05,
+                    "lat": rng.uniform(47, 55),
+                    "lon": rng.uniform(6, 15),
+                    "shortCode": f"X{i:04d}",
+                    "title": f"Bahnhof {i}",
+                    "photos": [
+                        {
+                            "createdAt": 1500000000000 + rng.randrange(10**11),
+                            "id": i * 10 + photo,
+                            "license": "CC0",
+                            "outdated": False,
+                            "path": f"/de/{i}_{photo}.jpg",
+                            "photographer": f"photographer{rng.randrange(200)}",
+                        }
+                        for photo in range(rng.randint(1, 4))
+                    ],
+                }
+                for i in range(stations)
+            ],
+        }
+    ).encode()
+
+
+def eager(body: bytes) -> Station:
+    return random.choice(Model(**json.loads(body)).stations)
+
+
+def lazy(body: bytes) -> Station:
+    return Station.model_validate(
+        reservoir_sample(
+            json.loads(body)["stations"], lambda station: bool(station.get("photos"))
+        )
+    )
+
+
+def measure(name: str, parse, body: bytes, runs: int):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse(body)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name}: median {statistics.median(times) * 1000:.1f}ms,"
+        f" min {min(times) * 1000:.1f}ms, peak memory {peak / 1024 / 1024:.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixture", help="recorded photoStationsByCountry response")
+    parser.add_argument("--stations", type=int, default=8000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    if args.fixture is not None:
+        with open(args.fixture, "rb") as file:
+            response = file.read()
+    else:
+        response = synthetic_response(args.stations)
+    print(f"response: {len(response) / 1024 / 1024:.1f}MB")
+    measure("validate everything", eager, response, args.runs)
+    measure("validate the picked station", lazy, response, args.runs)
@@ -0,0 +1,107 @@
+"""
+Compares rendering the mvg tickers into embeds cold, with an empty render cache, against
+warm, with every ticker already rendered, like a repeated !meldungen call.
+
+Without --fixture a synthetic ticker list is generated. A recorded response of
+https://www.mvg.de/api/ems/tickers can be passed with --fixture:
+
+    python -m benchmarks.ticker_render --tickers 500
+    python -m benchmarks.ticker_render --fixture tickers.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from mvg_api.v1.schemas.ticker import TickerList
+
+from bot.cogs.mvg.cache import CachedMVG, RenderCache
+from bot.cogs.mvg.mvg_cog import MVGCog
+
+
+def synthetic_tickers(tickers: int) -> list:
+    rng = random.Random(0)
+    return [
+        {
+            "id": f"ticker-{i}",
+            "type": rng.choice(["DISRUPTION", "PLANED", "INFO"]),
+            "title": f"U{rng.randint(1, 8)}: Störung {i}",
+            "text": "".join(
+                f"<p>Wegen <b>Bauarbeiten</b> zwischen <a href='https://www.mvg.de/{i}'>"
+                f"Haltestelle {j}</a> und Haltestelle {j + 1} kommt es zu Verspätungen.</p>"
+                f"<ul><li>Ersatzverkehr mit Bussen</li><li>Umleitung über Linie {j}</li></ul>"
+                for j in range(rng.randint(2, 8))
+            ),
+            "lines": [
+                {
+                    "id": f"line-{j}",
+                    "name": f"U{j}",
+                    "typeOfTransport": "UBAHN",
+                    "stations": [],
+                    "direction": "1",
+                }
+                for j in range(rng.randint(1, 3))
+            ],
+            "incidents": ["BAUARBEITEN"],
+            "links": [
+                {"name": f"Link {j}", "href": f"https://www.mvg.de/{i}/{j}"}
+                for j in range(rng.randint(1, 3))
+            ],
+            "downloadLinks": [],
+            "incidentDuration": [],
+            "activeDuration": {
+                "fromDate": "2024-03-01T05:00:00Z",
+                "toDate": "2024-03-08T23:00:00Z",
+            },
+            "modificationDate": "2024-03-01T04:00:00Z",
+        }
+        for i in range(tickers)
+    ]
+
+
+def measure(name: str, render, tickers: TickerList, runs: int):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for ticker in tickers:
+            render(ticker)
+        times.append(time.perf_counter() - start)
+    print(
+        f"{name}: median {statistics.median(times) * 1000:.1f}ms,"
+        f" min {min(times) * 1000:.1f}ms for {len(tickers)} tickers"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixture", help="recorded api/ems/tickers response")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    if args.fixture is not None:
+        with open(args.fixture, "rb") as file:
+            response = json.load(file)
+    else:
+        response = synthetic_tickers(args.tickers)
+    ticker_list = TickerList(response)
+    cog = MVGCog.__new__(MVGCog)
+    cog.api = CachedMVG(60)
+    measure(
+        "cold",
+        lambda ticker: RenderCache(len(ticker_list)).render(
+            ticker, cog.ticker_to_embed
+        ),
+        ticker_list,
+        args.runs,
+    )
+    cache = RenderCache(len(ticker_list))
+    for item in ticker_list:
+        cache.render(item, cog.ticker_to_embed)
+    measure(
+        "warm",
+        lambda ticker: cache.render(ticker, cog.ticker_to_embed),
+        ticker_list,
+        args.runs,
+    )
@@ -1,59 +1,126 @@
-import asyncio
 import datetime
+from typing import List, Type
 
+import discord
 import httpx
 from discord.ext import commands, tasks
-from sqlalchemy.orm import Session
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 
-from bot.cogs.deutschebahn.rs_api.api import RS
-from bot.cogs.deutschebahn.station import Station
+from bot.cogs.deutschebahn.feed import PhotoFeed, render_imports
+from bot.cogs.deutschebahn.geo import is_coordinate, nearest_stations
+from bot.cogs.deutschebahn.rs_api.api import FETCH_ERRORS, RS
+from bot.cogs.deutschebahn.rs_api.cache import ResponseCache
+from bot.cogs.deutschebahn.search import search_stations
+from bot.cogs.deutschebahn.station import Station, render_station
+from bot.cogs.shared.broadcast import Broadcaster
 from bot.config import config
-from bot.database.database import engine
-from bot.database.models.deutschebahn import RegisteredChannels
+from bot.database.database import async_session
+from bot.database.models.deutschebahn import PhotoFeedChannels, RegisteredChannels
 from bot.logger import logger
 
 
 class DeutscheBahnCog(commands.Cog):
-    __slots__ = ("bot", "station")
+    __slots__ = ("bot", "station", "feed", "broadcaster")
 
     bot: commands.Bot
     station: Station
+    feed: PhotoFeed
+    broadcaster: Broadcaster
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        api = RS(httpx.AsyncClient())
+        api = RS(
+            httpx.AsyncClient(),
+            ResponseCache(config.http_cache_directory, config.http_cache_max_age),
+        )
         self.station = Station(api)
-        self.session = Session(engine)
+        self.feed = PhotoFeed(api)
+        self.broadcaster = Broadcaster(
+            bot, config.post_concurrency, config.post_retries
+        )
         # pylint: disable=no-member
         self.message_of_the_day_task.start()
+        self.station_sync_task.start()
+        self.prerender_task.start()
+        self.photo_feed_task.start()
 
-    @commands.has_permissions(administrator=True)
-    @commands.command(name="subscribe")
-    async def subscribe_channel(self, ctx: commands.Context):
-        """
-        Subscribe to the Station of the day message with this channel
-        :param ctx:
-        :return:
-        """
+    @staticmethod
+    def _prune(model: Type[RegisteredChannels] | Type[PhotoFeedChannels]):
+        async def prune(channel_ids: List[int]):
+            logger.warning(f"Unsubscribing unreachable channels {channel_ids}")
+            async with async_session() as session:
+                await session.execute(delete(model).where(model.id.in_(channel_ids)))
+                await session.commit()
+
+        return prune
+
+    @staticmethod
+    async def _subscribe(
+        ctx: commands.Context,
+        model: Type[RegisteredChannels] | Type[PhotoFeedChannels],
+        name: str,
+        german_name: str,
+    ):
         channel_id = ctx.message.channel.id
-        if self.session.query(RegisteredChannels).filter_by(id=channel_id).first():
+        async with async_session() as session:
+            subscribed = await session.get(model, channel_id) is not None
+            if not subscribed:
+                session.add(model(id=channel_id))
+                await session.commit()
+        if subscribed:
             logger.warning(
-                f"Channel {ctx.channel.name} is already subscribed to station of the day"
+                f"Channel {ctx.channel.name} is already subscribed to {name}"
             )
             await ctx.send(
                 f"Kanal {ctx.channel.name} ist schon angemeldet", delete_after=10
             )
         else:
-            self.session.add(RegisteredChannels(id=channel_id))
-            self.session.commit()
-            logger.info(f"Channel {ctx.channel.name} subscribed to station of the day")
+            logger.info(f"Channel {ctx.channel.name} subscribed to {name}")
             await ctx.send(
-                f"Kanal {ctx.channel.name} ist angemeldet, für Station des Tages",
+                f"Kanal {ctx.channel.name} ist angemeldet, für {german_name}",
                 delete_after=10,
             )
         await ctx.message.delete(delay=10)
 
+    @staticmethod
+    async def _unsubscribe(
+        ctx: commands.Context,
+        model: Type[RegisteredChannels] | Type[PhotoFeedChannels],
+        name: str,
+        german_name: str,
+    ):
+        channel_id = ctx.message.channel.id
+        async with async_session() as session:
+            result = await session.execute(delete(model).where(model.id == channel_id))
+            await session.commit()
+        if result.rowcount == 0:
+            logger.warning(
+                f"Channel {ctx.channel.name} is not subscribed to {name}, unsubscribe not possible"
+            )
+            await ctx.send(
+                f"Kanal {ctx.channel.name} ist nicht angemeldet, abmelden nicht möglich",
+                delete_after=10,
+            )
+        else:
+            logger.info(f"Channel {ctx.channel.name} unsubscribed to {name}")
+            await ctx.send(
+                f"Kanal {ctx.channel.name} ist abgemeldet, für {german_name}",
+                delete_after=10,
+            )
+        await ctx.message.delete(delay=10)
+
+    @commands.has_permissions(administrator=True)
+    @commands.command(name="subscribe")
+    async def subscribe_channel(self, ctx: commands.Context):
+        """
+        Subscribe to the Station of the day message with this channel
+        :param ctx:
+        :return:
+        """
+        await self._subscribe(
+            ctx, RegisteredChannels, "station of the day", "Station des Tages"
+        )
+
     @commands.has_permissions(administrator=True)
     @commands.command(name="unsubscribe", alias="abmelden")
     async def unsubscribe_channel(self, ctx: commands.Context):
@@ -62,48 +129,184 @@ class DeutscheBahnCog(commands.Cog):
         :param ctx:
         :return:
         """
-        channel_id = ctx.message.channel.id
+        await self._unsubscribe(
+            ctx, RegisteredChannels, "station of the day", "Station des Tages"
+        )
+
+    @commands.has_permissions(administrator=True)
+    @commands.command(name="subscribe-photos")
+    async def subscribe_photos(self, ctx: commands.Context):
+        """
+        Subscribe to newly imported station photos with this channel
+        :param ctx:
+        :return:
+        """
+        await self._subscribe(ctx, PhotoFeedChannels, "the photo feed", "neue Fotos")
+
+    @commands.has_permissions(administrator=True)
+    @commands.command(name="unsubscribe-photos")
+    async def unsubscribe_photos(self, ctx: commands.Context):
+        """
+        Unsubscribe to newly imported station photos with this channel
+        :param ctx:
+        :return:
+        """
+        await self._unsubscribe(ctx, PhotoFeedChannels, "the photo feed", "neue Fotos")
+
+    @commands.command(name="nearby", aliases=["umgebung"])
+    async def nearby(self, ctx: commands.Context, *, query: str):
+        """
+        List the nearest stations with photos of a coordinate or a station
+        :param ctx:
+        :param query: "<lat> <lon>" or the name of a station
+        :return:
+        """
+        async with async_session() as session:
+            try:
+                lat, lon = (float(value) for value in query.replace(",", " ").split())
+                origin = f"{lat}, {lon}"
+            except ValueError:
+                if not (matches := await search_stations(session, query, 1)):
+                    await ctx.send(
+                        f"Keine Station mit dem Namen {query} gefunden", delete_after=10
+                    )
+                    await ctx.message.delete(delay=10)
+                    return
+                station, _ = matches[0]
+                lat, lon, origin = station.lat, station.lon, station.title
+            if not is_coordinate(lat, lon):
+                await ctx.send("Keine Stationen in der Nähe gefunden", delete_after=10)
+                await ctx.message.delete(delay=10)
+                return
+            stations = await nearest_stations(session, lat, lon, config.nearby_count)
+
+        embed = discord.Embed(
+            colour=discord.Colour.dark_red(),
+            color=discord.Color.lighter_grey(),
+            title=f"Stationen in der Nähe von {origin}",
+        )
+        embed.description = (
+            "\n".join(
+                f"[{station.title}](https://www.google.com/maps/@{station.lat},{station.lon},15z)"
+                f" ({country}) {distance:.1f} km"
+                for station, country, distance in stations
+            )
+            or "Keine Stationen in der Nähe gefunden"
+        )
+        await ctx.send(embed=embed, delete_after=120)
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="station", aliases=["bahnhof"])
+    async def search_station(self, ctx: commands.Context, *, query: str):
+        """
+        Show the station best matching the name, and list the next best matches
+        :param ctx:
+        :param query: name of the station, may be incomplete or misspelled
+        :return:
+        """
+        async with async_session() as session:
+            matches = await search_stations(session, query, config.search_count)
         if (
-            self.session.query(RegisteredChannels).filter_by(id=channel_id).first()
-            is None
+            not matches
+            or (found := await self.station.load_station(matches[0][0].pk)) is None
         ):
-            logger.warning(
-                f"Channel {ctx.channel.name} is not subscribed to station of the day, unsubscribe not possible"
-            )
             await ctx.send(
-                f"Kanal {ctx.channel.name} ist nicht angemeldet, abmelden nicht möglich",
-                delete_after=10,
+                f"Keine Station mit dem Namen {query} gefunden", delete_after=10
             )
-        else:
-            self.session.execute(
-                delete(RegisteredChannels).where(RegisteredChannels.id == channel_id)
-            )
-            self.session.commit()
-            logger.info(
-                f"Channel {ctx.channel.name} unsubscribed to station of the day"
-            )
-            await ctx.send(
-                f"Kanal {ctx.channel.name} ist abgemeldet, für Station des Tages",
-                delete_after=10,
+            await ctx.message.delete(delay=10)
+            return
+        description, photos = render_station(*found, of_the_day=False)
+        if len(matches) > 1:
+            description.add_field(
+                name="Weitere Treffer",
+                value="\n".join(
+                    f"{station.title} ({country})" for station, country in matches[1:]
+                ),
             )
+        await ctx.send(embeds=[description, *photos], delete_after=120)
         await ctx.message.delete(delay=10)
 
     @tasks.loop(time=datetime.time(hour=config.hour))
     async def message_of_the_day_task(self):
         logger.info("running station of the day task")
-        description, photos = await self.station.get_station_of_the_day()
-        for channel_id in self.session.query(RegisteredChannels).all():
-            logger.info(channel_id)
-            if (channel := self.bot.get_channel(channel_id.id)) is not None:
-                logger.info(f"sending station of the day to: {channel}")
-                await channel.send(embed=description)
-                await channel.send(embeds=photos)
-        await asyncio.sleep(10)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if (station := await self.station.get_post(now)) is None:
+            logger.error("No station of the day, skipping the message")
+            return
+        description, photos = station
+        async with async_session() as session:
+            channel_ids = (await session.scalars(select(RegisteredChannels.id))).all()
+        logger.info(f"sending station of the day to {len(channel_ids)} channels")
+        await self.broadcaster.broadcast(
+            channel_ids,
+            [{"embed": description}, {"embeds": photos}],
+            self._prune(RegisteredChannels),
+        )
 
     @message_of_the_day_task.before_loop
     async def before_my_task(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(hours=1)
+    async def prerender_task(self):
+        try:
+            await self.station.prerender(datetime.datetime.now(datetime.timezone.utc))
+        except FETCH_ERRORS as e:
+            logger.error(f"Error while prerendering the station of the day: {e}")
+
+    @prerender_task.before_loop
+    async def before_prerender_task(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(hours=config.station_sync_interval)
+    async def station_sync_task(self):
+        try:
+            await self.station.sync()
+        except FETCH_ERRORS as e:
+            logger.error(f"Error while syncing the stations: {e}")
+
+    @station_sync_task.before_loop
+    async def before_station_sync_task(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=config.photo_feed_interval)
+    async def photo_feed_task(self):
+        mark = await self.feed.load_mark()
+        try:
+            stations, newest = await self.feed.poll(mark)
+        except FETCH_ERRORS as e:
+            logger.error(f"Error while polling the photo feed: {e}")
+            return
+        if stations:
+            messages = render_imports(stations)
+            async with async_session() as session:
+                channel_ids = (
+                    await session.scalars(select(PhotoFeedChannels.id))
+                ).all()
+            logger.info(
+                f"sending {len(messages)} photo messages to {len(channel_ids)} channels"
+            )
+            await self.broadcaster.broadcast(
+                channel_ids,
+                [{"embeds": embeds} for embeds in messages],
+                self._prune(PhotoFeedChannels),
+            )
+        # advanced after sending, a restart in between posts the photos again instead of losing them
+        if newest is not None and newest != mark:
+            await self.feed.save_mark(newest)
+
+    @photo_feed_task.before_loop
+    async def before_photo_feed_task(self):
+        await self.bot.wait_until_ready()
+
+    async def cog_unload(self) -> None:
+        # pylint: disable=no-member
+        self.message_of_the_day_task.cancel()
+        self.station_sync_task.cancel()
+        self.prerender_task.cancel()
+        self.photo_feed_task.cancel()
+        await self.station.api.client.aclose()
+
 
 async def setup(client: commands.Bot) -> None:
     await client.add_cog(DeutscheBahnCog(client))
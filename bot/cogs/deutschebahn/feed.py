@@ -0,0 +1,121 @@
+import math
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+import discord
+from discord.embeds import Embed
+from sqlalchemy.dialects.sqlite import insert
+
+from bot.cogs.deutschebahn.rs_api.api import RS
+from bot.cogs.deutschebahn.rs_api.model import Station as ST
+from bot.cogs.deutschebahn.station import PHOTO_URL
+from bot.config import config
+from bot.database.database import async_session
+from bot.database.models.deutschebahn import FeedMark
+from bot.logger import logger
+
+FEED = "recent photo imports"
+# discord allows up to 10 embeds per message
+EMBEDS_PER_MESSAGE = 10
+
+
+def render_imports(stations: List[ST]) -> List[List[Embed]]:
+    """
+    Create an embed for every new photo, oldest first
+    :param stations: with only their new photos
+    :return: the embeds grouped into messages
+    """
+    photos = sorted(
+        ((photo, station) for station in stations for photo in station.photos),
+        key=lambda item: (item[0].createdAt, item[0].id),
+    )
+    embeds = []
+    for photo, station in photos:
+        embed = Embed(
+            colour=discord.Colour.dark_red(),
+            color=discord.Color.lighter_grey(),
+            title=f"Neues Foto: {station.title}",
+            url=f"https://www.google.com/maps/@{station.lat},{station.lon},15z",
+            timestamp=datetime.fromtimestamp(photo.createdAt / 1000),
+        )
+        embed.set_author(name=f"Fotograf: {photo.photographer}")
+        embed.set_footer(text=f"LIZENZ: {photo.license}")
+        embed.set_image(url=f"{PHOTO_URL}{photo.path}")
+        embeds.append(embed)
+    return [
+        embeds[i : i + EMBEDS_PER_MESSAGE]
+        for i in range(0, len(embeds), EMBEDS_PER_MESSAGE)
+    ]
+
+
+class PhotoFeed:
+    """
+    Polls the recently imported photos. Every poll asks for the hours since the newest photo
+    that was already posted, so the windows of consecutive polls overlap. Photos at or below
+    the high-water mark are dropped, before they are validated or rendered.
+    """
+
+    api: RS
+
+    def __init__(self, api: RS):
+        self.api = api
+
+    @staticmethod
+    async def load_mark() -> Tuple[int, int] | None:
+        async with async_session() as session:
+            if (mark := await session.get(FeedMark, FEED)) is None:
+                return None
+            return mark.created_at, mark.photo_id
+
+    @staticmethod
+    async def save_mark(mark: Tuple[int, int]):
+        created_at, photo_id = mark
+        async with async_session() as session:
+            statement = insert(FeedMark).values(
+                feed=FEED, created_at=created_at, photo_id=photo_id
+            )
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["feed"],
+                    set_={"created_at": created_at, "photo_id": photo_id},
+                )
+            )
+            await session.commit()
+
+    async def poll(
+        self, mark: Tuple[int, int] | None
+    ) -> Tuple[List[ST], Tuple[int, int] | None]:
+        """
+        Fetch the photos imported since the high-water mark
+        :param mark: createdAt and id of the newest photo already posted
+        :return: the stations with only their new photos, and the new high-water mark.
+        Without a mark nothing is returned as new, only the mark is initialised.
+        """
+        since_hours = config.photo_feed_max_hours
+        if mark is not None:
+            hours = math.ceil((time.time() - mark[0] / 1000) / 3600) + 1
+            since_hours = max(1, min(hours, config.photo_feed_max_hours))
+        if (
+            stations := await self.api.get_photo_stations_by_recent_photo_imports(
+                since_hours, mark
+            )
+        ) is None:
+            logger.warning("Couldn't fetch the recent photo imports")
+            return [], mark
+        newest = max(
+            (
+                (photo.createdAt, photo.id)
+                for station in stations
+                for photo in station.photos
+            ),
+            default=mark,
+        )
+        logger.info(
+            f"{sum(len(station.photos) for station in stations)} new photos"
+            f" of {len(stations)} stations in the last {since_hours}h"
+        )
+        if mark is None:
+            logger.info(f"Initialised the high-water mark of the {FEED} feed")
+            return [], newest
+        return stations, newest
@@ -0,0 +1,152 @@
+import math
+from typing import List, Tuple
+
+from sqlalchemy import ColumnElement, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models.deutschebahn import Country, StationOfTheDay
+
+# size of a grid cell in degrees, about 11km in north-south direction
+CELL_SIZE = 0.1
+COLUMNS = round(360 / CELL_SIZE)
+ROWS = round(180 / CELL_SIZE)
+# squares with more rows are searched as one latitude band filtered by longitude
+MAX_ROW_RANGES = 16
+EARTH_RADIUS = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def is_coordinate(lat: float, lon: float) -> bool:
+    """
+    True if lat and lon are finite and within -90..90 and -180..180
+    """
+    return (
+        math.isfinite(lat)
+        and math.isfinite(lon)
+        and -90 <= lat <= 90
+        and -180 <= lon <= 180
+    )
+
+
+def grid_position(lat: float, lon: float) -> Tuple[int, int]:
+    row = min(int((lat + 90) / CELL_SIZE), ROWS - 1)
+    column = int((lon + 180) / CELL_SIZE) % COLUMNS
+    return row, column
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    """
+    Number of the grid cell of a coordinate. Cells are numbered row by row from the south west,
+    so the cells of a row form a range. The migration computes the same number in SQL.
+    :param lat:
+    :param lon:
+    :return:
+    """
+    row, column = grid_position(lat, lon)
+    return row * COLUMNS + column
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great circle distance in km
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def column_ranges(column: int, radius: int) -> List[Tuple[int, int]]:
+    """
+    Column ranges around a column, split in two at the antimeridian
+    """
+    low, high = column - radius, column + radius
+    if high - low + 1 >= COLUMNS:
+        return [(0, COLUMNS - 1)]
+    if low < 0:
+        return [(low + COLUMNS, COLUMNS - 1), (0, high)]
+    if high >= COLUMNS:
+        return [(low, COLUMNS - 1), (0, high - COLUMNS)]
+    return [(low, high)]
+
+
+def square(row: int, column: int, radius: int) -> ColumnElement[bool]:
+    """
+    Condition for the stations in the square of cells with the given radius around a cell
+    """
+    first, last = max(0, row - radius), min(ROWS - 1, row + radius)
+    ranges = column_ranges(column, radius)
+    if last - first + 1 > MAX_ROW_RANGES:
+        return and_(
+            StationOfTheDay.cell.between(first * COLUMNS, (last + 1) * COLUMNS - 1),
+            or_(
+                *(
+                    StationOfTheDay.lon.between(
+                        low * CELL_SIZE - 180, (high + 1) * CELL_SIZE - 180
+                    )
+                    for low, high in ranges
+                )
+            ),
+        )
+    return or_(
+        *(
+            StationOfTheDay.cell.between(r * COLUMNS + low, r * COLUMNS + high)
+            for r in range(first, last + 1)
+            for low, high in ranges
+        )
+    )
+
+
+def covered_radius(lat: float, radius: int) -> float:
+    """
+    Distance in km up to which all stations are found in the square with the given radius
+    """
+    # the east-west size of a cell shrinks towards the poles, use the narrowest row of the square
+    narrowest = min(90.0, abs(lat) + (radius + 1) * CELL_SIZE)
+    return radius * CELL_SIZE * KM_PER_DEGREE * math.cos(math.radians(narrowest))
+
+
+async def nearest_stations(
+    session: AsyncSession,
+    lat: float,
+    lon: float,
+    count: int,
+    max_distance: float = 500,
+) -> List[Tuple[StationOfTheDay, str, float]]:
+    """
+    Find the nearest stations with the grid cell index. The square of cells around the
+    coordinate is doubled, until it covers the distance of the count-th nearest station.
+    :param session:
+    :param lat:
+    :param lon:
+    :param count: number of stations
+    :param max_distance: in km, farther stations are not returned
+    :return: the stations with the name of their country and their distance in km, nearest first
+    """
+    row, column = grid_position(lat, lon)
+    radius = 1
+    while True:
+        found = sorted(
+            (
+                (
+                    station,
+                    country or station.country,
+                    haversine(lat, lon, station.lat, station.lon),
+                )
+                for station, country in await session.execute(
+                    select(StationOfTheDay, Country.name)
+                    .outerjoin(Country, Country.code == StationOfTheDay.country)
+                    .where(square(row, column, radius))
+                )
+            ),
+            key=lambda item: item[2],
+        )
+        covered = covered_radius(lat, radius)
+        if len(found) >= count and found[count - 1][2] <= covered:
+            break
+        if radius * CELL_SIZE * KM_PER_DEGREE >= max_distance:
+            break
+        radius *= 2
+    return [item for item in found[:count] if item[2] <= max_distance]
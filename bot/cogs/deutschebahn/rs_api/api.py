@@ -1,22 +1,64 @@
-from typing import Dict, Any
+import json
+import random
+from typing import Callable, Dict, Any, Iterable, List, Tuple
 
 import httpx
-from bot.cogs.deutschebahn.rs_api.model import CountryList, Model
+from pydantic import ValidationError
+
+from bot.cogs.deutschebahn.rs_api.cache import ResponseCache
+from bot.cogs.deutschebahn.rs_api.model import CountryList, Model, Station
+from bot.logger import logger
+
+# a failed request, a server error or a response that isn't the expected json
+FETCH_ERRORS = (httpx.HTTPError, ValidationError, json.JSONDecodeError)
+
+
+def reservoir_sample(
+    items: Iterable[Any], predicate: Callable[[Any], bool] = lambda _: True
+) -> Any | None:
+    """
+    Pick a random item that matches the predicate in a single pass, without collecting the matches
+    :param items:
+    :param predicate:
+    :return: None if no item matches
+    """
+    chosen, seen = None, 0
+    for item in items:
+        if predicate(item):
+            seen += 1
+            if random.randrange(seen) == 0:
+                chosen = item
+    return chosen
 
 
 class RS:
     client: httpx.AsyncClient
+    cache: ResponseCache | None
     base_url: str = (
         "https://apis.deutschebahn.com/db-api-marketplace/apis/api.railway-stations.org"
     )
 
-    def __init__(self, client: httpx.AsyncClient):
+    def __init__(self, client: httpx.AsyncClient, cache: ResponseCache | None = None):
         self.client = client
+        self.cache = cache
 
-    async def _send_get_request(self, url: str) -> Dict[str, Any]:
+    async def _get_bytes(self, url: str, cached: bool = True) -> bytes | None:
+        if cached and self.cache is not None:
+            return await self.cache.get(self.client, self.base_url + url)
         response = await self.client.get(self.base_url + url)
         if response.status_code == 200:
-            return response.json()
+            return response.content
+        if response.status_code >= 500:
+            response.raise_for_status()
+        logger.warning(f"Request to {url} returned {response.status_code}")
+        return None
+
+    async def _send_get_request(
+        self, url: str, cached: bool = True
+    ) -> Dict[str, Any] | None:
+        if (body := await self._get_bytes(url, cached)) is not None:
+            return json.loads(body)
+        return None
 
     async def get_countries(self) -> CountryList | None:
         """
@@ -24,7 +66,7 @@ class RS:
         :return:
         """
         if (response := await self._send_get_request("/countries.json")) is not None:
-            return CountryList(__root__=response)
+            return CountryList(response)
 
     async def get_photo_station_by_id(self, country: str, _id: int) -> Model | Any:
         """
@@ -56,6 +98,31 @@ class RS:
         ) is not None:
             return Model(**response)
 
+    async def get_random_photo_station_by_country(
+        self, country: str, has_photo: bool = False
+    ) -> Station | None:
+        """
+        Pick a random station of a country. Unlike get_photo_station_by_country only the picked
+        station gets validated, the others stay plain dicts.
+        :param country:
+        :param has_photo: only pick stations with at least one photo
+        :return: None if the request failed or the country has no stations
+        """
+        if (
+            response := await self._send_get_request(
+                f"/photoStationsByCountry/{country}?hasPhoto={has_photo}"
+            )
+        ) is None:
+            return None
+        if (
+            station := reservoir_sample(
+                response.get("stations", []),
+                lambda station: not has_photo or bool(station.get("photos")),
+            )
+        ) is None:
+            return None
+        return Station.model_validate(station)
+
     async def get_photo_stations_by_photographer(self, photographer: str):
         """
         List stations with photos by the given photographer
@@ -69,17 +136,33 @@ class RS:
         ) is not None:
             return Model(**response)
 
-    async def get_photo_stations_by_recent_photo_imports(self, since_hours: int = 10):
+    async def get_photo_stations_by_recent_photo_imports(
+        self, since_hours: int = 10, after: Tuple[int, int] | None = None
+    ) -> List[Station] | None:
         """
-        List stations with photos uploaded in the last 24h
-        :return:
+        List stations with photos imported in the last hours, reduced to the photos newer than
+        after. The response is never cached, and only stations with new photos get validated.
+        :param since_hours:
+        :param after: createdAt and id of the newest photo already seen
+        :return: None if the request failed
         """
         if (
             response := await self._send_get_request(
-                f"/photoStationsByRecentPhotoImports?sinceHours={since_hours}"
+                f"/photoStationsByRecentPhotoImports?sinceHours={since_hours}",
+                cached=False,
             )
-        ) is not None:
-            return Model(**response)
+        ) is None:
+            return None
+        stations = []
+        for station in response.get("stations", []):
+            photos = [
+                photo
+                for photo in station.get("photos", [])
+                if after is None or (photo["createdAt"], photo["id"]) > after
+            ]
+            if photos:
+                stations.append(Station.model_validate(station | {"photos": photos}))
+        return stations
 
     async def get_photo(self, country: str, filename: str):
         """
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Tuple
+
+import httpx
+
+from bot.logger import logger
+
+
+def parse_cache_control(header: str | None) -> Dict[str, str | None]:
+    """
+    Parse a Cache-Control header into its directives
+    :param header: e.g. "public, max-age=3600"
+    :return: e.g. {"public": None, "max-age": "3600"}
+    """
+    directives = {}
+    for directive in (header or "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "stored", "max_age", "no_cache")
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    stored: float
+    max_age: float
+    no_cache: bool
+
+    def __init__(
+        self,
+        body: bytes,
+        *,
+        etag: str | None,
+        last_modified: str | None,
+        stored: float,
+        max_age: float,
+        no_cache: bool,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored = stored
+        self.max_age = max_age
+        self.no_cache = no_cache
+
+    @property
+    def fresh(self) -> bool:
+        return not self.no_cache and time.time() - self.stored < self.max_age
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "stored": self.stored,
+            "max_age": self.max_age,
+            "no_cache": self.no_cache,
+        }
+
+
+class ResponseCache:
+    """
+    Disk backed HTTP cache. Fresh responses are served without a request, stale ones are
+    revalidated with If-None-Match/If-Modified-Since, and served anyway if the server fails.
+    Responses without Cache-Control are considered fresh for default_max_age seconds.
+    """
+
+    __slots__ = (
+        "directory",
+        "default_max_age",
+        "requests",
+        "hits",
+        "revalidated",
+        "stale",
+        "saved_bytes",
+    )
+    directory: str
+    default_max_age: float
+    requests: int
+    hits: int
+    revalidated: int
+    stale: int
+    saved_bytes: int
+
+    def __init__(self, directory: str, default_max_age: float):
+        self.directory = directory
+        self.default_max_age = default_max_age
+        self.requests = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.stale = 0
+        self.saved_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def hit_rate(self) -> float:
+        if self.requests == 0:
+            return 0.0
+        return (self.hits + self.revalidated + self.stale) / self.requests
+
+    def summary(self) -> str:
+        return (
+            f"http cache: {self.requests} requests, hit rate {self.hit_rate:.0%}"
+            f" ({self.hits} fresh, {self.revalidated} revalidated, {self.stale} stale),"
+            f" {self.saved_bytes / 1024 / 1024:.1f}MB saved"
+        )
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        name = os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest())
+        return f"{name}.body", f"{name}.json"
+
+    def _load(self, url: str) -> CacheEntry | None:
+        body_path, metadata_path = self._paths(url)
+        try:
+            with open(metadata_path, encoding="utf-8") as file:
+                metadata = json.load(file)
+            with open(body_path, "rb") as file:
+                return CacheEntry(file.read(), **metadata)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, url: str, entry: CacheEntry, body: bool = True):
+        body_path, metadata_path = self._paths(url)
+        # the body is replaced before the metadata, so the validators never belong to an older body
+        if body:
+            with open(f"{body_path}.tmp", "wb") as file:
+                file.write(entry.body)
+            os.replace(f"{body_path}.tmp", body_path)
+        with open(f"{metadata_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(entry.metadata(), file)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    def _update(self, entry: CacheEntry, response: httpx.Response):
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        entry.stored = time.time()
+        entry.max_age = self.default_max_age
+        if (max_age := directives.get("max-age")) is not None and max_age.isdigit():
+            entry.max_age = int(max_age)
+        entry.no_cache = "no-cache" in directives
+        entry.etag = response.headers.get("ETag", entry.etag)
+        entry.last_modified = response.headers.get("Last-Modified", entry.last_modified)
+
+    async def get(self, client: httpx.AsyncClient, url: str) -> bytes | None:
+        """
+        Get the body of a url from the cache or the server
+        :param client:
+        :param url:
+        :return: None if the server doesn't have the url and nothing is cached
+        :raises httpx.HTTPError: if the request or the server fails and nothing is cached
+        """
+        self.requests += 1
+        entry = await asyncio.to_thread(self._load, url)
+        if entry is not None and entry.fresh:
+            self.hits += 1
+            self.saved_bytes += len(entry.body)
+            return entry.body
+
+        error = None
+        try:
+            response = await client.get(
+                url, headers=entry.validators() if entry is not None else None
+            )
+        except httpx.HTTPError as e:
+            response, error = None, e
+            logger.warning(f"Request to {url} failed: {e}")
+
+        if response is not None and response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            self.saved_bytes += len(entry.body)
+            self._update(entry, response)
+            await asyncio.to_thread(self._store, url, entry, False)
+            return entry.body
+        if response is not None and response.status_code == 200:
+            if "no-store" not in parse_cache_control(
+                response.headers.get("Cache-Control")
+            ):
+                entry = CacheEntry(
+                    response.content,
+                    etag=None,
+                    last_modified=None,
+                    stored=0,
+                    max_age=0,
+                    no_cache=False,
+                )
+                self._update(entry, response)
+                await asyncio.to_thread(self._store, url, entry)
+            return response.content
+
+        if response is not None:
+            logger.warning(f"Request to {url} returned {response.status_code}")
+        if entry is not None:
+            self.stale += 1
+            self.saved_bytes += len(entry.body)
+            logger.warning(f"Serving stale response of {url}")
+            return entry.body
+        # without a stale copy the failure is the caller's, so it can retry
+        if error is not None:
+            raise error
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return None
@@ -0,0 +1,86 @@
+import re
+from typing import List, Set, Tuple
+
+from sqlalchemy import TableClause, column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models.deutschebahn import Country, StationOfTheDay
+
+# fts5 tables kept in sync with stations.title by triggers, see the migration 3fdd71c8b8ed
+words = table("stations_fts", column("rowid"), column("title"), column("rank"))
+trigrams = table("stations_trigram", column("rowid"), column("title"), column("rank"))
+# share of the trigrams of a misspelled query a title has to contain
+MIN_SIMILARITY = 0.4
+WORD = re.compile(r"\w+")
+
+
+def quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def to_trigrams(text: str) -> Set[str]:
+    text = " ".join(text.lower().split())
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def prefix_query(query: str) -> str | None:
+    """
+    Match titles containing every word of the query, the last word may be incomplete
+    :param query: e.g. "münchen hbf"
+    :return: e.g. '"münchen" "hbf"*', None if the query has no words
+    """
+    terms = [quote(term) for term in WORD.findall(query)]
+    if not terms:
+        return None
+    return " ".join(terms[:-1] + [terms[-1] + "*"])
+
+
+def trigram_query(query: str) -> str | None:
+    """
+    Match titles sharing any trigram with the query, titles sharing more trigrams rank higher
+    :param query:
+    :return: None if the query is shorter than three characters
+    """
+    if not (terms := to_trigrams(query)):
+        return None
+    return " OR ".join(quote(term) for term in sorted(terms))
+
+
+async def _match(
+    session: AsyncSession, index: TableClause, query: str, limit: int
+) -> List[Tuple[StationOfTheDay, str]]:
+    rows = await session.execute(
+        select(StationOfTheDay, Country.name)
+        .join(index, index.c.rowid == StationOfTheDay.pk)
+        .outerjoin(Country, Country.code == StationOfTheDay.country)
+        .where(index.c.title.match(query))
+        .order_by(index.c.rank)
+        .limit(limit)
+    )
+    return [(station, country or station.country) for station, country in rows]
+
+
+async def search_stations(
+    session: AsyncSession, query: str, limit: int
+) -> List[Tuple[StationOfTheDay, str]]:
+    """
+    Search stations by title, ranked by bm25. If no title contains the words of the query,
+    titles with the most trigrams in common with the query are returned instead.
+    :param session:
+    :param query:
+    :param limit: maximal number of stations
+    :return: the stations with the name of their country, best match first
+    """
+    if (match := prefix_query(query)) is not None and (
+        found := await _match(session, words, match, limit)
+    ):
+        return found
+    if (match := trigram_query(query)) is None:
+        return []
+    expected = to_trigrams(query)
+    # bm25 favours rare trigrams, drop titles that only share a few of them with the query
+    return [
+        (station, country)
+        for station, country in await _match(session, trigrams, match, limit * 4)
+        if len(expected & to_trigrams(station.title)) >= MIN_SIMILARITY * len(expected)
+    ][:limit]
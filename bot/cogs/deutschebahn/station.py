@@ -1,65 +1,453 @@
-from datetime import datetime
+import asyncio
+from datetime import date, datetime, timedelta
+import itertools
 import random
+import time
 from typing import List, Tuple
 
 import discord
 from discord.embeds import Embed
-from bot.cogs.deutschebahn.rs_api.api import RS
-from bot.cogs.deutschebahn.rs_api.model import Station as ST
+from sqlalchemy import ColumnElement, delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from bot.cogs.deutschebahn.geo import grid_cell
+from bot.cogs.deutschebahn.rs_api.api import FETCH_ERRORS, RS
+from bot.cogs.deutschebahn.rs_api.model import Country as CT, Station as ST
+from bot.config import config
+from bot.database.database import async_session
+from bot.database.models.deutschebahn import (
+    Country,
+    StationOfTheDay,
+    StationPhoto,
+    StationPost,
+)
+from bot.logger import logger
+from bot.metrics import Metric
+
+
+def next_post_day(now: datetime) -> date:
+    """
+    Day of the next Station of the Day message, it is posted at config.hour UTC
+    :param now: in UTC
+    :return:
+    """
+    post = now.replace(hour=config.hour, minute=0, second=0, microsecond=0)
+    if now >= post:
+        post += timedelta(days=1)
+    return post.date()
+
+
+PHOTO_URL = "https://apis.deutschebahn.com/db-api-marketplace/apis/api.railway-stations.org/photos/"
+MAX_PHOTOS = 4
+
+
+def to_station(
+    station: ST, synced: datetime | None = None
+) -> Tuple[StationOfTheDay, List[StationPhoto]]:
+    """
+    Convert a station of the api into the database models
+    :param station:
+    :param synced:
+    :return: the station and its photos, the first one is the primary photo
+    """
+    return StationOfTheDay(
+        country=station.country,
+        id=station.id,
+        inactive=bool(station.inactive),
+        lat=station.lat,
+        lon=station.lon,
+        title=station.title,
+        short_code=station.shortCode,
+        cell=grid_cell(station.lat, station.lon),
+        synced=synced,
+    ), [
+        StationPhoto(
+            id=photo.id,
+            position=position,
+            created_at=photo.createdAt,
+            license=photo.license,
+            path=photo.path,
+            photographer=photo.photographer,
+            outdated=bool(photo.outdated),
+            synced=synced,
+        )
+        for position, photo in enumerate(station.photos)
+    ]
+
+
+def render_station(
+    station: StationOfTheDay,
+    photos: List[StationPhoto],
+    country: str,
+    of_the_day: bool = True,
+) -> Tuple[Embed, List[Embed]]:
+    """
+    Create the station embed and up to four photo embeds
+    :param station:
+    :param photos: of the station, ordered by their position
+    :param country: name of the country of the station
+    :param of_the_day: introduce the station as the Station of the Day
+    :return:
+    """
+    active = "Die Station ist noch aktiv und wird genutzt."
+    if station.inactive:
+        active = (
+            "Die Station ist leider inaktiv und wird schon länger nicht mehr genutzt."
+        )
+
+    short_code = ""
+    if (
+        station.short_code is not None
+        and station.short_code != "NULL"
+        and station.short_code != "**"
+        and station.short_code
+    ):
+        short_code = f"Sie besitzt die Abkürzung **{station.short_code}**, welche Bahn angestelten genutzt wird."
+
+    station_of_the_day = Embed(
+        colour=discord.Colour.dark_red(),
+        color=discord.Color.lighter_grey(),
+        title=station.title,
+        description=f"Diese wunder schöne Station aus {country}, "
+        f"{'ist heute die Station des Tages' if of_the_day else 'passt am besten zu deiner Suche'}. "
+        f"Sie befindet sich genau [hier](https://www.google.com/maps/"
+        f"@{station.lat},{station.lon},15z). {active} {short_code}",
+    )
+    _photos = []
+    for photo in photos[:MAX_PHOTOS]:
+        photo_embed = Embed(
+            colour=discord.Colour.dark_red(),
+            color=discord.Color.lighter_grey(),
+            timestamp=datetime.fromtimestamp(photo.created_at / 1000),
+        )
+        photo_embed.set_author(name=f"Fotograf: {photo.photographer}")
+        photo_embed.set_footer(text=f"LIZENZ: {photo.license}")
+        photo_embed.set_image(url=f"{PHOTO_URL}{photo.path}")
+        _photos.append(photo_embed)
+    return station_of_the_day, _photos
 
 
 class Station:
     api: RS
+    fetch_latency: Metric
 
     def __init__(self, api: RS):
         self.api = api
+        self.fetch_latency = Metric("station of the day fetch")
+
+    async def sync(self) -> int:
+        """
+        Mirror the stations with photos of all countries into the database. Stations and photos
+        that are no longer returned by the api get deleted.
+        :return: number of synced stations
+        """
+        if (countries := await self.api.get_countries()) is None:
+            logger.warning("Couldn't fetch the countries, skipping the station sync")
+            return 0
+        synced = datetime.now()
+        async with async_session() as session:
+            statement = insert(Country)
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["code"],
+                    set_={
+                        "name": statement.excluded.name,
+                        "active": statement.excluded.active,
+                    },
+                ),
+                [
+                    {
+                        "code": country.code,
+                        "name": country.name,
+                        "active": country.active,
+                    }
+                    for country in countries.root
+                ],
+            )
+            await session.commit()
 
-    async def get_station_of_the_day(self) -> Tuple[Embed, List[Embed]]:
-        countries = await self.api.get_countries()
-        country = random.choice(list(countries.__root__))
+        total = 0
+        for country in countries.root:
+            try:
+                stations = await self.api.get_photo_station_by_country(
+                    country.code, has_photo=True
+                )
+            except FETCH_ERRORS as e:
+                logger.warning(f"Fetching the stations of {country.code} failed: {e!r}")
+                stations = None
+            if stations is None:
+                logger.warning(f"Couldn't fetch the stations of {country.code}")
+                continue
+            await self._store(
+                country.code, [to_station(s, synced) for s in stations.stations], synced
+            )
+            total += len(stations.stations)
+        logger.info(f"synced {total} stations of {len(countries.root)} countries")
+        if self.api.cache is not None:
+            logger.info(self.api.cache.summary())
+        return total
 
-        stations = await self.api.get_photo_station_by_country(
-            country.code, has_photo=True
+    @staticmethod
+    async def _store(
+        country: str,
+        stations: List[Tuple[StationOfTheDay, List[StationPhoto]]],
+        synced: datetime,
+    ):
+        columns = (
+            "country",
+            "id",
+            "inactive",
+            "lat",
+            "lon",
+            "title",
+            "short_code",
+            "cell",
         )
-        while len(stations.stations) == 0:
-            country = random.choice(list(countries.__root__))
-            stations = await self.api.get_photo_station_by_country(
-                country.code, has_photo=True
+        async with async_session() as session:
+            if stations:
+                statement = insert(StationOfTheDay)
+                pks = dict(
+                    (
+                        await session.execute(
+                            statement.on_conflict_do_update(
+                                index_elements=["country", "id"],
+                                set_={
+                                    column: statement.excluded[column]
+                                    for column in columns + ("synced",)
+                                },
+                            ).returning(StationOfTheDay.id, StationOfTheDay.pk),
+                            [
+                                {column: getattr(station, column) for column in columns}
+                                | {"synced": synced}
+                                for station, _ in stations
+                            ],
+                        )
+                    ).all()
+                )
+                photos = [
+                    {
+                        "id": photo.id,
+                        "station_pk": pks[station.id],
+                        "position": photo.position,
+                        "created_at": photo.created_at,
+                        "license": photo.license,
+                        "path": photo.path,
+                        "photographer": photo.photographer,
+                        "outdated": photo.outdated,
+                        "synced": synced,
+                    }
+                    for station, station_photos in stations
+                    for photo in station_photos
+                ]
+                if photos:
+                    statement = insert(StationPhoto)
+                    await session.execute(
+                        statement.on_conflict_do_update(
+                            index_elements=["id"],
+                            set_={
+                                column: statement.excluded[column]
+                                for column in photos[0]
+                                if column != "id"
+                            },
+                        ),
+                        photos,
+                    )
+            in_country = select(StationOfTheDay.pk).where(
+                StationOfTheDay.country == country
             )
-        station: ST = random.choice(stations.stations)
-        active = "Die Station ist noch aktiv und wird genutzt."
-        if station.inactive:
-            active = "Die Station ist leider inaktiv und wird schon länger nicht mehr genutzt."
-
-        short_code = ""
-        if (
-            station.shortCode is not None
-            and station.shortCode != "NULL"
-            and station.shortCode != "**"
-            and station.shortCode
-        ):
-            short_code = f"Sie besitzt die Abkürzung **{station.shortCode}**, welche Bahn angestelten genutzt wird."
-
-        station_of_the_day = Embed(
-            colour=discord.Colour.dark_red(),
-            color=discord.Color.lighter_grey(),
-            title=station.title,
-            description=f"Diese wunder schöne Station aus {country.name}, ist heute die Station "
-            f"des Tages. Sie befindet sich genau [hier](https://www.google.com/maps/"
-            f"@{station.lat},{station.lon},15z). {active} {short_code}",
+            await session.execute(
+                delete(StationPhoto)
+                .where(StationPhoto.station_pk.in_(in_country))
+                .where(StationPhoto.synced < synced)
+            )
+            await session.execute(
+                delete(StationOfTheDay)
+                .where(StationOfTheDay.country == country)
+                .where(StationOfTheDay.synced < synced)
+            )
+            await session.commit()
+
+    @staticmethod
+    async def pick_station() -> Tuple[StationOfTheDay, List[StationPhoto], str] | None:
+        """
+        Pick a random station with its country name and photos in a single query. A random pk
+        between the smallest and the largest one is looked up in the primary key index, the
+        station after a gap left by a deleted station is slightly more likely to be picked.
+        :return: None if no stations are synced yet
+        """
+        first, last = func.min(StationOfTheDay.pk), func.max(StationOfTheDay.pk)
+        random_pk = select(func.abs(func.random()) % (last - first + 1) + first)
+        picked = (
+            select(StationOfTheDay.pk)
+            .where(StationOfTheDay.pk >= random_pk.scalar_subquery())
+            .order_by(StationOfTheDay.pk)
+            .limit(1)
+        )
+        return await Station.load_station(picked.scalar_subquery())
+
+    @staticmethod
+    async def load_station(
+        pk: int | ColumnElement[int],
+    ) -> Tuple[StationOfTheDay, List[StationPhoto], str] | None:
+        """
+        Load a station with its country name and photos in a single query
+        :param pk: of the station, or a scalar subquery selecting it
+        :return: None if the station doesn't exist
+        """
+        async with async_session() as session:
+            rows = (
+                await session.execute(
+                    select(StationOfTheDay, Country.name, StationPhoto)
+                    .outerjoin(Country, Country.code == StationOfTheDay.country)
+                    .outerjoin(
+                        StationPhoto,
+                        (StationPhoto.station_pk == StationOfTheDay.pk)
+                        & (StationPhoto.position < MAX_PHOTOS),
+                    )
+                    .where(StationOfTheDay.pk == pk)
+                    .order_by(StationPhoto.position)
+                )
+            ).all()
+        if not rows:
+            return None
+        station, country, _ = rows[0]
+        return (
+            station,
+            [photo for _, _, photo in rows if photo is not None],
+            country or station.country,
         )
-        _photos = []
-        for photo in station.photos[: min(4, len(station.photos))]:
-            photo_embed = Embed(
-                colour=discord.Colour.dark_red(),
-                color=discord.Color.lighter_grey(),
-                timestamp=datetime.fromtimestamp(photo.createdAt / 1000),
+
+    async def _fetch_country(self, country: CT) -> Tuple[ST | None, str]:
+        """
+        Fetch a random station of a country, with a timeout per request and retries with jitter
+        :param country:
+        :return: the station, None if the country has none or all attempts failed, and the country name
+        """
+        for attempt in range(config.station_fetch_retries + 1):
+            try:
+                async with asyncio.timeout(config.station_fetch_timeout):
+                    return (
+                        await self.api.get_random_photo_station_by_country(
+                            country.code, has_photo=True
+                        ),
+                        country.name,
+                    )
+            except (TimeoutError, *FETCH_ERRORS) as e:
+                logger.warning(
+                    f"Fetching a station of {country.code} failed, attempt {attempt + 1}: {e!r}"
+                )
+            if attempt < config.station_fetch_retries:
+                await asyncio.sleep(random.uniform(0, 2**attempt))
+        return None, country.name
+
+    async def fetch_station_of_the_day(self) -> Tuple[ST, str] | None:
+        """
+        Fetch a random station from the api. Several random countries are queried at once, when
+        one has no station the next one is started. The first station wins and the other
+        requests get cancelled. The whole fetch is limited to station_fetch_deadline seconds.
+        :return: the station and the name of its country, None if no station was found in time
+        """
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(config.station_fetch_deadline):
+                countries = await self.api.get_countries()
+                if countries is None:
+                    return None
+                candidates = iter(random.sample(countries.root, len(countries.root)))
+                pending = set()
+                try:
+                    while True:
+                        # keep station_fetch_concurrency countries in flight
+                        for candidate in itertools.islice(
+                            candidates, config.station_fetch_concurrency - len(pending)
+                        ):
+                            pending.add(
+                                asyncio.create_task(self._fetch_country(candidate))
+                            )
+                        if not pending:
+                            return None
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            station, country = task.result()
+                            if station is not None:
+                                return station, country
+                finally:
+                    for task in pending:
+                        task.cancel()
+        except TimeoutError:
+            logger.error(
+                f"No station of the day found within {config.station_fetch_deadline}s"
+            )
+            return None
+        except FETCH_ERRORS as e:
+            logger.error(f"Fetching the countries failed: {e!r}")
+            return None
+        finally:
+            self.fetch_latency.record(time.perf_counter() - start)
+            logger.info(self.fetch_latency.summary())
+
+    async def get_station_of_the_day(self) -> Tuple[Embed, List[Embed]] | None:
+        if (picked := await self.pick_station()) is not None:
+            return render_station(*picked)
+
+        logger.warning("No stations synced yet, fetching the station of the day")
+        if (fetched := await self.fetch_station_of_the_day()) is None:
+            return None
+        station, country = fetched
+        return render_station(*to_station(station), country)
+
+    async def prerender(self, now: datetime) -> bool:
+        """
+        Pick and render the station of the next post and store it, unless that already happened
+        :param now: in UTC
+        :return: True if a post was rendered
+        """
+        day = next_post_day(now)
+        async with async_session() as session:
+            await session.execute(
+                delete(StationPost).where(StationPost.day < now.date())
             )
-            photo_embed.set_author(name=f"Fotograf: {photo.photographer}")
-            photo_embed.set_footer(text=f"LIZENZ: {photo.license}")
-            photo_embed.set_image(
-                url=f"https://apis.deutschebahn.com/db-api-marketplace/apis/api.railway-stations"
-                f".org/photos/{photo.path}"
+            await session.commit()
+            if await session.get(StationPost, day) is not None:
+                return False
+        if (station := await self.get_station_of_the_day()) is None:
+            logger.warning(f"Couldn't prerender the station of the day of {day}")
+            return False
+        description, photos = station
+        async with async_session() as session:
+            session.add(
+                StationPost(
+                    day=day,
+                    embeds=[embed.to_dict() for embed in (description, *photos)],
+                    rendered=datetime.now(),
+                )
             )
-            _photos.append(photo_embed)
-        return station_of_the_day, _photos
+            await session.commit()
+        logger.info(f"Prerendered the station of the day of {day}: {description.title}")
+        return True
+
+    @staticmethod
+    async def prerendered(day: date) -> Tuple[Embed, List[Embed]] | None:
+        """
+        The station of the day rendered ahead of time
+        :param day:
+        :return: None if it wasn't prerendered
+        """
+        async with async_session() as session:
+            if (post := await session.get(StationPost, day)) is None:
+                return None
+        description, *photos = (Embed.from_dict(embed) for embed in post.embeds)
+        return description, photos
+
+    async def get_post(self, now: datetime) -> Tuple[Embed, List[Embed]] | None:
+        """
+        The station of the day to post now, prerendered or rendered on demand
+        :param now: in UTC
+        :return: None if no station was found
+        """
+        if (post := await self.prerendered(now.date())) is not None:
+            return post
+        logger.warning("The station of the day wasn't prerendered, rendering it now")
+        return await self.get_station_of_the_day()
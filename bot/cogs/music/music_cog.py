@@ -1,22 +1,32 @@
-from typing import Dict, List
+from typing import Dict, Tuple
 import datetime
 
 import discord
-import yt_dlp.YoutubeDL
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ext.commands import MissingAnyRole, CommandNotFound
 from discord.utils import get
-from sqlalchemy.orm import Session
 
+from bot.cogs.music.offline.cache import TrackCache
 from bot.cogs.music.player import MusicPlayer
-from bot.cogs.music.online.youtube_dl import AudioSource, YTDLError
+from bot.cogs.music.online.broadcast import BroadcastHub
+from bot.cogs.music.online.cache import MetadataCache
+from bot.cogs.music.online.extractor import ExtractionService
+from bot.cogs.music.online.youtube_dl import (
+    AudioSource,
+    Track,
+    YTDLError,
+)
+from bot.cogs.music.statistics import record_plays
 from bot.cogs.utlis import check_roles
-from bot.database.database import engine
+from bot.database.writer import BatchWriter
 from bot.database.models.musicplayer import SongRequest
 from bot.logger import logger
 from bot.config import config
 
 
+QUEUE_PAGE_SIZE = 15
+
+
 class VoiceConnectionError(commands.CommandError):
     """Custom Exception class for connection errors."""
 
@@ -25,16 +35,67 @@ class InvalidVoiceChannel(VoiceConnectionError):
     """Exception for cases of invalid Voice Channels."""
 
 
-class Player(commands.Cog):
-    __slots__ = ("bot", "players", "config")
+class Player(commands.Cog):  # pylint: disable=too-many-public-methods
+    __slots__ = (
+        "bot",
+        "players",
+        "config",
+        "extractor",
+        "cache",
+        "track_cache",
+        "broadcasts",
+        "requests",
+    )
 
     bot: commands.Bot
     players: Dict[int, MusicPlayer]
+    extractor: ExtractionService
+    cache: MetadataCache
+    track_cache: TrackCache
+    broadcasts: BroadcastHub | None
+    requests: BatchWriter
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.players = {}
-        self.session = Session(engine)
+        self.requests = BatchWriter(
+            "song requests",
+            config.write_batch_size,
+            config.write_interval / 1000,
+            on_flush=record_plays,
+        )
+        self.extractor = ExtractionService(
+            config.ytdl_format_options,
+            workers=config.extractor_workers,
+            mode=config.extractor_mode,
+        )
+        self.cache = MetadataCache(
+            config.metadata_cache_size,
+            datetime.timedelta(hours=config.metadata_cache_ttl),
+        )
+        self.track_cache = TrackCache(
+            config.offline_cache_directory,
+            config.offline_cache_size * 1024 * 1024,
+            config.offline_cache_min_plays,
+            self.extractor,
+        )
+        self.broadcasts = (
+            BroadcastHub(config.broadcast_buffer) if config.broadcast else None
+        )
+
+    async def cog_load(self) -> None:
+        self.extractor.start()
+        self.requests.start()
+        # pylint: disable=no-member
+        self.offline_cache_task.start()
+
+    @tasks.loop(hours=config.offline_cache_interval)
+    async def offline_cache_task(self):
+        await self.track_cache.warm_up(config.offline_cache_tracks)
+
+    @offline_cache_task.before_loop
+    async def before_offline_cache_task(self):
+        await self.bot.wait_until_ready()
 
     @commands.command(name="play")
     async def play(self, ctx: commands.Context, *, search: str):
@@ -52,33 +113,91 @@ class Player(commands.Cog):
         player = self.get_player(ctx)
 
         async with ctx.typing():
-            async for source in AudioSource.create_sources(
+            async for track in AudioSource.create_sources(
                 search,
                 ctx=ctx,
-                loop=ctx.bot.loop,
-                ffmpeg_options=config.ffmpeg_options,
-                ytdl=yt_dlp.YoutubeDL(config.ytdl_format_options),
+                extractor=self.extractor,
+                cache=self.cache,
                 default_info=config.default_info,
             ):
-                logger.info(f"{ctx.message.author} is queuing {source.title}")
-                await player.queue.put(source)
-                await self.add_request_to_database(ctx, source)
+                logger.info(f"{ctx.message.author} is queuing {track.title}")
+                player.queue.put(track)
+                self.add_request_to_database(ctx, track)
+        player.resolve_ahead()
         await ctx.message.delete(delay=10)
 
     @commands.command(name="queue")
-    async def queue(self, ctx: commands.Context):
+    async def queue(self, ctx: commands.Context, page: int = 1):
+        """Shows the queued songs, 15 per page."""
         player = self.get_player(ctx)
-        play_list: List[AudioSource] = await player.get_playlist()
-        message = "\n**Durchsagenlist**\n"
+        play_list: Tuple[Track, ...] = player.queue.snapshot()
+        pages = max(1, -(-len(play_list) // QUEUE_PAGE_SIZE))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * QUEUE_PAGE_SIZE
+        message = f"\n**Durchsagenlist** ({page}/{pages})\n"
         message += "\n".join(
             [
-                f"__{index + 1:01n}__. **{source.title}**"
-                for index, source in enumerate(play_list)
+                f"__{index + 1:01n}__. **{track.title}**"
+                for index, track in enumerate(
+                    play_list[start : start + QUEUE_PAGE_SIZE], start=start
+                )
             ]
         )
         await ctx.message.delete(delay=10)
         await ctx.send(message, delete_after=30)
 
+    @commands.command(name="remove")
+    async def remove(self, ctx: commands.Context, position: int):
+        """Removes the song at the given position from the queue."""
+        player = self.get_player(ctx)
+        try:
+            track = player.queue.remove(position - 1)
+        except IndexError:
+            await ctx.send(f"Keine Durchsage an Position {position}", delete_after=10)
+        else:
+            logger.info(f"{ctx.message.author.name} removed {track.title}")
+            await ctx.send(f"**{track.title}** entfernt", delete_after=10)
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="move")
+    async def move(self, ctx: commands.Context, source: int, destination: int):
+        """Moves the song at position source to position destination."""
+        player = self.get_player(ctx)
+        try:
+            track = player.queue.move(source - 1, destination - 1)
+        except IndexError:
+            await ctx.send(
+                f"Keine Durchsage an Position {source} oder {destination}",
+                delete_after=10,
+            )
+        else:
+            logger.info(
+                f"{ctx.message.author.name} moved {track.title} to {destination}"
+            )
+            await ctx.send(
+                f"**{track.title}** ist jetzt an Position {destination}",
+                delete_after=10,
+            )
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="shuffle")
+    async def shuffle(self, ctx: commands.Context):
+        """Shuffles the queue."""
+        self.get_player(ctx).queue.shuffle()
+        logger.info(f"{ctx.message.author.name} shuffled the queue")
+        await ctx.send("Durchsagenliste gemischt", delete_after=10)
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="clear")
+    async def clear(self, ctx: commands.Context):
+        """Removes all songs from the queue."""
+        player = self.get_player(ctx)
+        player.stop_resolving()
+        count = player.queue.clear()
+        logger.info(f"{ctx.message.author.name} cleared {count} songs from the queue")
+        await ctx.send(f"{count} Durchsagen entfernt", delete_after=10)
+        await ctx.message.delete(delay=10)
+
     async def connect(
         self, ctx: commands.Context, *, channel: discord.VoiceChannel = None
     ) -> None:
@@ -124,6 +243,20 @@ class Player(commands.Cog):
             logger.info(f"{ctx.message.author.name} resumed")
         await ctx.message.delete(delay=10)
 
+    @commands.command(name="volume")
+    async def volume(self, ctx: commands.Context, volume: int) -> None:
+        """Changes the volume in percent, between 0 and 200."""
+        player = self.get_player(ctx)
+        player.volume = min(max(volume, 0), 200) / 100
+        logger.info(f"{ctx.message.author.name} changed the volume to {player.volume}")
+        if player.current is None or player.current.set_volume(player.volume):
+            await ctx.send(f"Lautstärke ist jetzt {volume}%", delete_after=10)
+        else:
+            await ctx.send(
+                f"Lautstärke ist ab der nächsten Durchsage {volume}%", delete_after=10
+            )
+        await ctx.message.delete(delay=10)
+
     @commands.command(name="skip")
     async def skip(self, ctx: commands.Context) -> None:
         player = self.get_player(ctx)
@@ -151,7 +284,7 @@ class Player(commands.Cog):
             logger.warning(f"Error in cleanup, disconnection the client: {e}")
 
         try:
-            del self.players[guild.id]
+            self.players.pop(guild.id).close()
         except KeyError as e:
             logger.warning(f"Error in cleanup, removing the player from Players: {e}")
 
@@ -199,16 +332,15 @@ class Player(commands.Cog):
         self.players[ctx.guild.id] = player
         return player
 
-    async def add_request_to_database(self, ctx: commands.Context, source: AudioSource):
+    def add_request_to_database(self, ctx: commands.Context, track: Track):
         request = SongRequest(
             date=datetime.datetime.today(),
-            title=source.title,
+            title=track.title,
             requester_id=ctx.message.author.id,
-            web_page=source.web_page,
+            web_page=track.web_page,
             server_id=ctx.guild.id,
         )
-        self.session.add(request)
-        self.session.commit()
+        self.requests.add(request)
 
     async def _send_error_msg(self, ctx: commands.Context, message: str) -> None:
         send_message = await ctx.send(message, delete_after=20)
@@ -218,7 +350,10 @@ class Player(commands.Cog):
         await send_message.add_reaction(emoji)
 
     async def cog_unload(self) -> None:
-        self.session.close()
+        # pylint: disable=no-member
+        self.offline_cache_task.cancel()
+        await self.extractor.close()
+        await self.requests.close()
 
 
 async def setup(client: commands.Bot) -> None:
@@ -0,0 +1,174 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import shutil
+from typing import List, Tuple
+
+import yt_dlp
+from sqlalchemy import func, select
+
+from bot.cogs.music.online.extractor import ExtractionService, YTDLError
+from bot.database.database import async_session
+from bot.database.models.musicplayer import OfflineTrack, TrackPlays
+from bot.logger import logger
+
+# webm with opus audio can be played without converting it to another codec
+AUDIO_FORMAT = "bestaudio[ext=webm][acodec=opus]/bestaudio[acodec=opus]/bestaudio"
+
+
+class TrackCache:
+    """
+    Disk backed cache of often requested tracks. Tracks requested more than min_plays times
+    get downloaded once and are played from disk afterwards. If the cache grows bigger than
+    max_bytes, the least frequently used tracks get evicted, ties are broken by the last use.
+    """
+
+    __slots__ = ("directory", "max_bytes", "min_plays", "extractor", "lock")
+    directory: str
+    max_bytes: int
+    min_plays: int
+    extractor: ExtractionService
+    lock: asyncio.Lock
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        min_plays: int,
+        extractor: ExtractionService,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.extractor = extractor
+        self.lock = asyncio.Lock()
+        os.makedirs(os.path.join(directory, ".tmp"), exist_ok=True)
+
+    async def lookup(self, web_page: str) -> Tuple[str, str | None] | None:
+        """
+        Get the path and audio codec of the cached file of a track and count the hit
+        :param web_page:
+        :return: None if the track is not cached
+        """
+        async with async_session() as session:
+            if (track := await session.get(OfflineTrack, web_page)) is None:
+                return None
+            path = os.path.join(self.directory, track.filename)
+            if not os.path.exists(path):
+                await session.delete(track)
+                await session.commit()
+                return None
+            track.hits += 1
+            track.last_used = datetime.datetime.now()
+            codec = track.codec
+            await session.commit()
+        return path, codec
+
+    async def store(self, guild_id: int, web_page: str) -> str | None:
+        """
+        Download a track into the cache. The file is written to a temporary directory first
+        and moved into the cache afterwards, so a lookup never sees a half written file.
+        :param guild_id: the guild the download is queued for
+        :param web_page:
+        :return: the path of the cached file
+        """
+        name = hashlib.sha1(web_page.encode()).hexdigest()
+        tmp_directory = os.path.join(self.directory, ".tmp", name)
+        try:
+            downloaded = await self.extractor.download(
+                guild_id,
+                web_page,
+                os.path.join(tmp_directory, f"{name}.%(ext)s"),
+                AUDIO_FORMAT,
+            )
+            if downloaded is None or not os.path.exists(downloaded[0]):
+                return None
+            filename = os.path.basename(downloaded[0])
+            path = os.path.join(self.directory, filename)
+            os.replace(downloaded[0], path)
+        except (YTDLError, yt_dlp.utils.DownloadError) as e:
+            logger.warning(f"Couldn't download {web_page} into the offline cache: {e}")
+            return None
+        finally:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+
+        async with async_session() as session:
+            await session.merge(
+                OfflineTrack(
+                    web_page=web_page,
+                    filename=filename,
+                    codec=downloaded[1],
+                    size=os.path.getsize(path),
+                    hits=0,
+                    last_used=datetime.datetime.now(),
+                )
+            )
+            await session.commit()
+        logger.info(f"stored {web_page} in the offline cache as {filename}")
+        await self.evict(keep=web_page)
+        return path
+
+    async def evict(self, keep: str | None = None):
+        """
+        Remove tracks until the cache is smaller than max_bytes
+        :param keep: web page of a track that must not be evicted, like the one just downloaded
+        :return:
+        """
+        async with async_session() as session:
+            total = await session.scalar(select(func.sum(OfflineTrack.size))) or 0
+            if total <= self.max_bytes:
+                return
+            for track in await session.scalars(
+                select(OfflineTrack)
+                .where(OfflineTrack.web_page != keep)
+                .order_by(OfflineTrack.hits.asc(), OfflineTrack.last_used.asc())
+            ):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, track.filename))
+                except FileNotFoundError:
+                    pass
+                total -= track.size
+                await session.delete(track)
+                logger.info(f"evicted {track.web_page} from the offline cache")
+            await session.commit()
+
+    async def popular_tracks(self, limit: int) -> List[Tuple[str, str]]:
+        """
+        The most requested tracks of every guild, that are requested more than min_plays times
+        and are not cached yet
+        :param limit: number of tracks per guild
+        :return: list of guild id and web page
+        """
+        async with async_session() as session:
+            cached = select(OfflineTrack.web_page)
+            tracks = []
+            for guild_id in await session.scalars(
+                select(TrackPlays.server_id).distinct()
+            ):
+                tracks.extend(
+                    (guild_id, web_page)
+                    for web_page in await session.scalars(
+                        select(TrackPlays.web_page)
+                        .where(TrackPlays.server_id == guild_id)
+                        .where(TrackPlays.plays > self.min_plays)
+                        .where(TrackPlays.web_page.not_in(cached))
+                        .order_by(TrackPlays.plays.desc())
+                        .limit(limit)
+                    )
+                )
+            return tracks
+
+    async def warm_up(self, limit: int):
+        """
+        Download the most requested tracks of every guild
+        :param limit: number of tracks per guild
+        :return:
+        """
+        async with self.lock:
+            tracks = await self.popular_tracks(limit)
+            logger.info(f"warming up offline cache with {len(tracks)} tracks")
+            for guild_id, web_page in tracks:
+                await self.store(int(guild_id), web_page)
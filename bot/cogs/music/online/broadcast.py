@@ -0,0 +1,154 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Set, Tuple
+
+import discord
+
+from bot.logger import logger
+
+
+class Broadcast:
+    """
+    One decoder for a track, its frames are shared by all voice clients playing the same track.
+    The last frames are kept in a ring buffer, the subscriber that needs a frame first
+    reads it from the decoder. Every broadcast has its own lock, so a stalled stream only
+    holds up its own listeners.
+    """
+
+    __slots__ = (
+        "key",
+        "source",
+        "frames",
+        "position",
+        "finished",
+        "subscribers",
+        "lock",
+    )
+    key: str
+    source: discord.AudioSource
+    frames: Deque[bytes]
+    position: int
+    finished: bool
+    subscribers: Set["BroadcastSubscriber"]
+    lock: threading.Lock
+
+    def __init__(self, key: str, source: discord.AudioSource, size: int):
+        self.key = key
+        self.source = source
+        self.frames = deque(maxlen=size)
+        self.position = 0
+        self.finished = False
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def read(self, index: int) -> Tuple[bytes, int]:
+        """
+        Read the frame at the given index, must be called with the lock of the broadcast
+        :param index:
+        :return: the frame and the index of the next frame
+        """
+        # a subscriber that fell behind the ring buffer skips to the oldest frame
+        index = max(index, self.position - len(self.frames))
+        if index == self.position:
+            if self.finished:
+                return b"", index
+            if not (frame := self.source.read()):
+                self.finished = True
+                return b"", index
+            self.frames.append(frame)
+            self.position += 1
+        return self.frames[index - (self.position - len(self.frames))], index + 1
+
+
+class BroadcastSubscriber(discord.AudioSource):
+    __slots__ = ("hub", "broadcast", "index")
+    hub: "BroadcastHub"
+    broadcast: Broadcast
+    index: int
+
+    def __init__(self, hub: "BroadcastHub", broadcast: Broadcast):
+        self.hub = hub
+        self.broadcast = broadcast
+        # late joiners start at the current position
+        self.index = broadcast.position
+
+    def read(self) -> bytes:
+        # never the lock of the hub, reading blocks until the decoder delivers the frame
+        with self.broadcast.lock:
+            frame, self.index = self.broadcast.read(self.index)
+        return frame
+
+    def is_opus(self) -> bool:
+        return self.broadcast.source.is_opus()
+
+    def cleanup(self) -> None:
+        self.hub.leave(self)
+
+
+class BroadcastHub:
+    """
+    Registry of the running broadcasts, keyed by the web page of the track. The lock only
+    guards the registry and the subscribers, it is never held while reading from a source.
+    """
+
+    __slots__ = ("broadcasts", "size", "lock")
+    broadcasts: Dict[str, Broadcast]
+    size: int
+    lock: threading.Lock
+
+    def __init__(self, size: int):
+        """
+        :param size: number of 20ms frames kept in the ring buffer of a broadcast
+        """
+        self.broadcasts = {}
+        self.size = size
+        self.lock = threading.Lock()
+
+    def _subscribe(self, broadcast: Broadcast) -> BroadcastSubscriber:
+        subscriber = BroadcastSubscriber(self, broadcast)
+        broadcast.subscribers.add(subscriber)
+        return subscriber
+
+    def join(self, key: str) -> BroadcastSubscriber | None:
+        """
+        Subscribe to the running broadcast of a track
+        :param key:
+        :return: None if the track is not broadcast at the moment
+        """
+        with self.lock:
+            broadcast = self.broadcasts.get(key)
+            if broadcast is None or broadcast.finished:
+                return None
+            logger.info(
+                f"joining broadcast of {key} at frame {broadcast.position}, {len(broadcast.subscribers) + 1} listeners"
+            )
+            return self._subscribe(broadcast)
+
+    def start(self, key: str, source: discord.AudioSource) -> BroadcastSubscriber:
+        """
+        Start a broadcast of the source. If somebody else started a broadcast of the
+        same track in the meantime, the source is closed and that one is joined.
+        :param key:
+        :param source:
+        :return:
+        """
+        with self.lock:
+            broadcast = self.broadcasts.get(key)
+            if broadcast is None or broadcast.finished:
+                broadcast = Broadcast(key, source, self.size)
+                self.broadcasts[key] = broadcast
+                source = None
+            subscriber = self._subscribe(broadcast)
+        if source is not None:
+            source.cleanup()
+        return subscriber
+
+    def leave(self, subscriber: BroadcastSubscriber):
+        broadcast = subscriber.broadcast
+        with self.lock:
+            broadcast.subscribers.discard(subscriber)
+            if broadcast.subscribers:
+                return
+            if self.broadcasts.get(broadcast.key) is broadcast:
+                del self.broadcasts[broadcast.key]
+        broadcast.source.cleanup()
@@ -0,0 +1,151 @@
+import datetime
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+
+from bot.database.database import async_session
+from bot.database.models.musicplayer import StreamUrl, TrackInfo
+from bot.logger import logger
+
+# metadata of a track that gets cached, the stream url is cached separately since it expires
+METADATA_KEYS = (
+    "title",
+    "webpage_url",
+    "duration",
+    "uploader",
+    "uploader_url",
+    "thumbnail",
+)
+TRACKING_PARAMETERS = ("si", "feature", "pp", "t")
+
+
+def normalize_key(query: str) -> str:
+    """
+    Normalize a url or search, so the same song always gets the same cache key
+    :param query:
+    :return:
+    """
+    query = query.strip()
+    parsed = urlparse(query)
+    if parsed.scheme not in ("http", "https"):
+        return " ".join(query.lower().split())
+    host = parsed.netloc.lower()
+    for prefix in ("www.", "m.", "music."):
+        host = host.removeprefix(prefix)
+    params = parse_qsl(parsed.query)
+    if host == "youtu.be":
+        host, path = "youtube.com", "/watch"
+        params.append(("v", parsed.path.strip("/")))
+    else:
+        path = parsed.path.rstrip("/")
+    if host == "youtube.com":
+        params = [(key, value) for key, value in params if key in ("v", "list")]
+    else:
+        params = [
+            (key, value)
+            for key, value in params
+            if key not in TRACKING_PARAMETERS and not key.startswith("utm_")
+        ]
+    return f"{host}{path}?{urlencode(sorted(params))}"
+
+
+def to_metadata(info: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = {key: info[key] for key in METADATA_KEYS if info.get(key) is not None}
+    if "webpage_url" not in metadata:
+        # flat playlist entries only have the url of the web page
+        metadata["webpage_url"] = info.get("url")
+    return metadata
+
+
+class MetadataCache:
+    """
+    Two level cache for the results of yt-dlp lookups, an in memory LRU in front of
+    the trackinfo table. The stream urls are stored with their expiry in the streamurl table.
+    """
+
+    __slots__ = ("entries", "streams", "size", "ttl", "hits", "misses")
+    entries: OrderedDict[str, Tuple[List[Dict[str, Any]], datetime.datetime]]
+    streams: OrderedDict[str, Tuple[str, float | None, str | None]]
+    size: int
+    ttl: datetime.timedelta
+    hits: int
+    misses: int
+
+    def __init__(self, size: int, ttl: datetime.timedelta):
+        self.entries = OrderedDict()
+        self.streams = OrderedDict()
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: str, value, size: int):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    async def get(self, query: str) -> List[Dict[str, Any]] | None:
+        """
+        Get the cached metadata of all tracks found for the url or search
+        :param query:
+        :return: None if nothing is cached or the entry is too old
+        """
+        key = normalize_key(query)
+        if (cached := self.entries.get(key)) is None:
+            async with async_session() as session:
+                if (row := await session.get(TrackInfo, key)) is not None:
+                    cached = (json.loads(row.entries), row.updated)
+                    self._remember(self.entries, key, cached, self.size)
+        if cached is None or datetime.datetime.now() - cached[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        logger.info(
+            f"metadata cache hit for {key} ({self.hits} hits, {self.misses} misses)"
+        )
+        return cached[0]
+
+    async def put(self, query: str, entries: List[Dict[str, Any]]):
+        key = normalize_key(query)
+        entries = [to_metadata(entry) for entry in entries]
+        updated = datetime.datetime.now()
+        self._remember(self.entries, key, (entries, updated), self.size)
+        async with async_session() as session:
+            await session.merge(
+                TrackInfo(key=key, entries=json.dumps(entries), updated=updated)
+            )
+            await session.commit()
+
+    async def get_stream(
+        self, web_page: str
+    ) -> Tuple[str, float | None, str | None] | None:
+        """
+        Get the cached stream url of a web page with its expiry and audio codec
+        :param web_page:
+        :return:
+        """
+        if (cached := self.streams.get(web_page)) is None:
+            async with async_session() as session:
+                if (row := await session.get(StreamUrl, web_page)) is None:
+                    return None
+                cached = (row.url, row.expires, row.codec)
+                self._remember(self.streams, web_page, cached, self.size)
+        if cached[1] is not None and cached[1] < time.time():
+            return None
+        return cached
+
+    async def put_stream(
+        self, web_page: str, url: str, expires: float | None, codec: str | None
+    ):
+        self._remember(self.streams, web_page, (url, expires, codec), self.size)
+        async with async_session() as session:
+            await session.merge(
+                StreamUrl(web_page=web_page, url=url, expires=expires, codec=codec)
+            )
+            await session.commit()
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError
+
+from bot.logger import logger
+
+# keys of an info dict the bot needs, everything else (formats, thumbnails, ...) is dropped
+# before the result leaves the worker
+INFO_KEYS = (
+    "_type",
+    "_filename",
+    "id",
+    "title",
+    "url",
+    "webpage_url",
+    "duration",
+    "uploader",
+    "uploader_url",
+    "thumbnail",
+    "acodec",
+)
+
+_worker = threading.local()
+
+
+class YTDLError(Exception):
+    """
+    Exception if youtub_dl fails to extract am audio file/url
+    """
+
+
+def _picklable_errors(func: Callable) -> Callable:
+    """
+    Raise the DownloadErrors of a worker job as YTDLError. A DownloadError holds the
+    exc_info and the logger of the YoutubeDL instance, so it can't be sent back from a worker process.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        try:
+            return func(*args)
+        except DownloadError as e:
+            raise YTDLError(str(e)) from None
+
+    return wrapper
+
+
+def _init_worker(options: Dict[str, Any]):
+    _worker.options = options
+    _worker.ytdl = YoutubeDL(options)
+
+
+def _slim(data: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    if data is None:
+        return None
+    slim = {key: data[key] for key in INFO_KEYS if key in data}
+    if "entries" in data:
+        slim["entries"] = [_slim(entry) for entry in data["entries"] if entry]
+    return slim
+
+
+@_picklable_errors
+def _extract(url: str, download: bool) -> Dict[str, Any] | None:
+    ytdl: YoutubeDL = _worker.ytdl
+    data = ytdl.extract_info(url, download=download)
+    if data is not None and download:
+        for entry in data.get("entries") or [data]:
+            if entry:
+                entry["_filename"] = ytdl.prepare_filename(entry)
+    return _slim(data)
+
+
+@_picklable_errors
+def _extract_flat(url: str) -> Dict[str, Any] | None:
+    """
+    Extract the given url without resolving the entries of a playlist. The entries only contain
+    the id, title and web page. Single videos and searches get resolved completely.
+    """
+    ytdl: YoutubeDL = _worker.ytdl
+    data = ytdl.extract_info(url, download=False, process=False)
+    if data is None:
+        return None
+    if data.get("_type") in ("playlist", "multi_video"):
+        data["entries"] = list(data["entries"])
+        return _slim(data)
+    return _slim(ytdl.process_ie_result(data, download=False))
+
+
+@_picklable_errors
+def _download(url: str, outtmpl: str, audio_format: str) -> Tuple[str, str] | None:
+    """
+    Download a single track with its own YoutubeDL instance, because the output template and format differ
+    """
+    options = {
+        **_worker.options,
+        "outtmpl": outtmpl,
+        "format": audio_format,
+        "noplaylist": True,
+    }
+    with YoutubeDL(options) as ytdl:
+        data = ytdl.extract_info(url, download=True)
+        if data is None:
+            return None
+        return ytdl.prepare_filename(data), data.get("acodec")
+
+
+class ExtractionService:
+    """
+    Runs the yt-dlp extraction on a bounded pool of workers, each with its own long-lived
+    YoutubeDL instance. Jobs are queued per guild and the guilds are served round-robin,
+    so a guild queuing a huge playlist can't starve the other guilds.
+    """
+
+    __slots__ = ("executor", "workers", "queues", "ready", "tasks")
+    executor: Executor
+    workers: int
+    queues: OrderedDict[int, Deque[Tuple[asyncio.Future, Callable, tuple]]]
+    ready: asyncio.Semaphore
+    tasks: List[asyncio.Task]
+
+    def __init__(self, options: Dict[str, Any], workers: int = 4, mode: str = "thread"):
+        """
+        :param options: the options for the YoutubeDL instances
+        :param workers: number of YoutubeDL instances
+        :param mode: thread or process, the extractors parsing is cpu heavy and holds the GIL
+        """
+        if mode == "process":
+            self.executor = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(options,)
+            )
+        else:
+            self.executor = ThreadPoolExecutor(
+                workers,
+                thread_name_prefix="ytdl",
+                initializer=_init_worker,
+                initargs=(options,),
+            )
+        self.workers = workers
+        self.queues = OrderedDict()
+        self.ready = asyncio.Semaphore(0)
+        self.tasks = []
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"started {self.workers} extraction workers")
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _next_job(self) -> Tuple[asyncio.Future, Callable, tuple]:
+        guild_id, queue = next(iter(self.queues.items()))
+        job = queue.popleft()
+        if queue:
+            self.queues.move_to_end(guild_id)
+        else:
+            del self.queues[guild_id]
+        return job
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.ready.acquire()
+            future, func, args = self._next_job()
+            if future.done():
+                continue
+            try:
+                result = await loop.run_in_executor(self.executor, func, *args)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _submit(self, guild_id: int, func: Callable, *args) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(guild_id, deque()).append((future, func, args))
+        self.ready.release()
+        return await future
+
+    async def extract(
+        self, guild_id: int, url: str, download: bool = False
+    ) -> Dict[str, Any] | None:
+        """
+        Extract and process the given url or search
+        :param guild_id: the guild the job is queued for
+        :param url:
+        :param download:
+        :return:
+        """
+        return await self._submit(guild_id, _extract, url, download)
+
+    async def extract_flat(self, guild_id: int, url: str) -> Dict[str, Any] | None:
+        """
+        Extract the given url, the entries of playlists are not resolved
+        :param guild_id: the guild the job is queued for
+        :param url:
+        :return:
+        """
+        return await self._submit(guild_id, _extract_flat, url)
+
+    async def download(
+        self, guild_id: int, url: str, outtmpl: str, audio_format: str
+    ) -> Tuple[str, str] | None:
+        """
+        Download a single track
+        :param guild_id: the guild the job is queued for
+        :param url:
+        :param outtmpl: yt-dlp output template
+        :param audio_format: yt-dlp format selector
+        :return: the path of the downloaded file and its audio codec
+        """
+        return await self._submit(guild_id, _download, url, outtmpl, audio_format)
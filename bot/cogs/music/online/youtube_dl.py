@@ -1,59 +1,146 @@
 import asyncio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Set
+from urllib.parse import urlparse, parse_qs
 
 import discord
 import yt_dlp
 from discord.ext import commands
-from yt_dlp import YoutubeDL
 
+from bot.cogs.music.offline.cache import TrackCache
+from bot.cogs.music.online.broadcast import BroadcastHub
+from bot.cogs.music.online.cache import MetadataCache
+from bot.cogs.music.online.extractor import ExtractionService, YTDLError
+from bot.cogs.music.playlist import Playlist
 from bot.logger import logger
 
 # Suppress noise about console usage from errors
 yt_dlp.utils.bug_reports_message = lambda: ""
 
 
-class YTDLError(Exception):
+def stream_expiry(url: str | None) -> float | None:
     """
-    Exception if youtub_dl fails to extract am audio file/url
+    Read the unix timestamp from the ``expire`` query parameter of a stream url
+    :param url:
+    :return: the timestamp or None if the url does not expire
     """
+    if url is None:
+        return None
+    expire = parse_qs(urlparse(url).query).get("expire")
+    if not expire:
+        return None
+    try:
+        return float(expire[0])
+    except ValueError:
+        return None
 
 
-class AudioSource(discord.PCMVolumeTransformer):
+class Track:  # pylint: disable=too-many-instance-attributes
+    """
+    A queued song. Only holds the metadata, the ffmpeg process is created
+    by :meth:`AudioSource.from_track` right before the track gets played.
+    """
+
     __slots__ = (
-        "requester",
-        "channel",
         "title",
+        "web_page",
         "duration",
+        "requester",
+        "channel",
+        "url",
+        "expires",
+        "codec",
         "uploader",
         "uploader_url",
         "thumbnail",
-        "url",
-        "description",
     )
+    title: str
+    web_page: str
+    duration: int | None
     requester: discord.Member
     channel: discord.TextChannel
-    title: str
-    duration: int
+    url: str | None
+    expires: float | None
+    codec: str | None
     uploader: str
     uploader_url: str
     thumbnail: str
-    url: str
-    description: str
 
-    def __init__(
-        self, original: discord.AudioSource, ctx: commands.Context, data: Dict[str, Any]
-    ):
-        super().__init__(original, volume=1.0)
+    def __init__(self, ctx: commands.Context, data: Dict[str, Any]):
         self.title = data.get("title")
+        self.web_page = data.get("webpage_url") or data.get("url")
         self.duration = data.get("duration")
         self.uploader = data.get("uploader")
         self.uploader_url = data.get("uploader_url")
         self.thumbnail = data.get("thumbnail")
-        self.url = data.get("url")
-        self.web_page = data.get("webpage_url")
-        self.description = data.get("description")
         self.requester = ctx.author
         self.channel = ctx.channel
+        self.url = None
+        self.expires = None
+        self.codec = None
+
+    def set_url(self, url: str, expires: float | None = None, codec: str | None = None):
+        self.url = url
+        self.expires = expires if expires is not None else stream_expiry(url)
+        self.codec = codec
+
+    def update(self, data: Dict[str, Any]):
+        """
+        Take the metadata of a fully resolved track, flat playlist entries often miss
+        the duration, uploader and thumbnail, so the defaults were used for them
+        :param data:
+        :return:
+        """
+        for key in ("title", "duration", "uploader", "uploader_url", "thumbnail"):
+            if (value := data.get(key)) is not None:
+                setattr(self, key, value)
+
+    @property
+    def expired(self) -> bool:
+        """
+        True if the track has no stream url or the url expires before the track could be played to the end
+        """
+        if self.url is None:
+            return True
+        if self.expires is None:
+            return False
+        return time.time() + (self.duration or 0) + 60 > self.expires
+
+    async def resolve_cached(self, cache: MetadataCache) -> bool:
+        """
+        Take the stream url from the cache, if the track has none or the old one is expired
+        :param cache:
+        :return: True if the track has a valid stream url
+        """
+        if self.expired and (stream := await cache.get_stream(self.web_page)):
+            self.set_url(*stream)
+            if entries := await cache.get(self.web_page):
+                self.update(entries[0])
+        return not self.expired
+
+    async def resolve(
+        self, extractor: ExtractionService, cache: MetadataCache | None = None
+    ):
+        """
+        Fetch a new stream url, if the track has none or the old one is expired
+        :param extractor:
+        :param cache: looked up before the extractor is used
+        :return:
+        """
+        if not self.expired:
+            return
+        if cache is not None and await self.resolve_cached(cache):
+            return
+        logger.info(f"Resolving stream url for {self.title}")
+        data = await extractor.extract(self.requester.guild.id, self.web_page)
+        if data is None or "url" not in data:
+            raise YTDLError(f"Couldn't resolve a stream url for `{self.web_page}`")
+        self.update(data)
+        self.set_url(data["url"], codec=data.get("acodec"))
+        if cache is not None:
+            # the same key a !play of the web page uses, so its metadata is found again
+            await cache.put(self.web_page, [data])
+            await cache.put_stream(self.web_page, self.url, self.expires, self.codec)
 
     def to_embed(self) -> discord.Embed:
         return (
@@ -73,30 +160,213 @@ class AudioSource(discord.PCMVolumeTransformer):
         return discord.Activity(
             type=discord.ActivityType.listening,
             name=self.title,
-            details=self.description,
             url=self.web_page,
         )
 
+
+async def resolve_in_batches(
+    queue: Playlist[Track],
+    *,
+    extractor: ExtractionService,
+    cache: MetadataCache | None = None,
+    count: int,
+    batch_size: int,
+):
+    """
+    Resolve the stream urls of the first count tracks of the queue in the background,
+    batch_size tracks at a time. Every batch is taken from the queue as it is by then,
+    so removed tracks are skipped. The tracks further back are resolved by the prefetcher,
+    their stream urls would expire before they are played otherwise.
+    :param queue:
+    :param extractor:
+    :param cache:
+    :param count: number of tracks at the head of the queue to resolve
+    :param batch_size:
+    :return:
+    """
+    seen: Set[Track] = set()
+    while True:
+        batch = [track for track in queue.peek(count) if track not in seen]
+        if not batch:
+            return
+        batch = batch[:batch_size]
+        seen.update(batch)
+        results = await asyncio.gather(
+            *(track.resolve(extractor, cache) for track in batch),
+            return_exceptions=True,
+        )
+        for track, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Couldn't resolve {track.title} in background: {result}"
+                )
+
+
+class AudioSource(discord.AudioSource):
+    """
+    Source of a playing track. Opus streams are passed through ffmpeg without decoding,
+    only if the volume gets changed the audio is decoded to PCM and encoded again.
+    """
+
+    __slots__ = ("original", "track")
+    original: discord.AudioSource
+    track: Track
+
+    def __init__(self, original: discord.AudioSource, track: Track):
+        self.original = original
+        self.track = track
+
+    def read(self) -> bytes:
+        return self.original.read()
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self) -> None:
+        self.original.cleanup()
+
+    def set_volume(self, volume: float) -> bool:
+        """
+        Change the volume of the source
+        :param volume:
+        :return: False if the volume can't be changed, because the source is passed through as opus
+        """
+        if isinstance(self.original, discord.PCMVolumeTransformer):
+            self.original.volume = volume
+            return True
+        return volume == 1.0
+
+    @property
+    def title(self) -> str:
+        return self.track.title
+
+    def to_embed(self) -> discord.Embed:
+        return self.track.to_embed()
+
+    def to_activity(self) -> discord.Activity:
+        return self.track.to_activity()
+
+    @staticmethod
+    def _ffmpeg(
+        source: str,
+        *,
+        codec: str | None,
+        volume: float,
+        passthrough: bool,
+        before_options: str | None,
+        options: str | None,
+    ) -> discord.AudioSource:
+        if passthrough and codec == "opus" and volume == 1.0:
+            return discord.FFmpegOpusAudio(
+                source, codec="opus", before_options=before_options, options=options
+            )
+        return discord.PCMVolumeTransformer(
+            discord.FFmpegPCMAudio(
+                source, before_options=before_options, options=options
+            ),
+            volume=volume,
+        )
+
     @classmethod
-    async def _create_source(
+    async def _open(
+        cls,
+        track: Track,
+        *,
+        extractor: ExtractionService,
+        cache: MetadataCache | None,
+        track_cache: TrackCache | None,
+        ffmpeg_options: Dict[str, str],
+        volume: float,
+        passthrough: bool,
+    ) -> discord.AudioSource:
+        if track_cache is not None and (
+            cached := await track_cache.lookup(track.web_page)
+        ):
+            path, codec = cached
+            logger.info(f"Creating new source {track.title} from disk, {path}")
+            # the reconnect options of the before_options only apply to streams
+            return cls._ffmpeg(
+                path,
+                codec=codec,
+                volume=volume,
+                passthrough=passthrough,
+                before_options=None,
+                options=ffmpeg_options.get("options"),
+            )
+        await track.resolve(extractor, cache)
+        logger.info(f"Creating new source {track.title} ({track.codec}), {track.url}")
+        return cls._ffmpeg(
+            track.url,
+            codec=track.codec,
+            volume=volume,
+            passthrough=passthrough,
+            before_options=ffmpeg_options.get("before_options"),
+            options=ffmpeg_options.get("options"),
+        )
+
+    @classmethod
+    async def from_track(
+        cls,
+        track: Track,
+        *,
+        extractor: ExtractionService,
+        cache: MetadataCache | None = None,
+        track_cache: TrackCache | None = None,
+        broadcasts: BroadcastHub | None = None,
+        ffmpeg_options: Dict[str, str],
+        volume: float = 1.0,
+        passthrough: bool = True,
+    ):
+        """
+        Create the ffmpeg backed source of a track, the stream url gets resolved again if it is expired.
+        Tracks in the offline cache are played from disk. If the track is already broadcast to another
+        guild, its decoder is shared instead of starting a new one.
+        :param track:
+        :param extractor:
+        :param cache:
+        :param track_cache:
+        :param broadcasts: only used if the volume is not changed
+        :param ffmpeg_options:
+        :param volume:
+        :param passthrough: pass opus streams through without decoding them, if the volume is not changed
+        :return:
+        """
+        broadcasts = broadcasts if volume == 1.0 else None
+        if broadcasts is not None and (subscriber := broadcasts.join(track.web_page)):
+            return cls(subscriber, track)
+        original = await cls._open(
+            track,
+            extractor=extractor,
+            cache=cache,
+            track_cache=track_cache,
+            ffmpeg_options=ffmpeg_options,
+            volume=volume,
+            passthrough=passthrough,
+        )
+        if broadcasts is not None:
+            original = broadcasts.start(track.web_page, original)
+        return cls(original, track)
+
+    @classmethod
+    def _create_track(
         cls,
         *,
         ctx: commands.Context,
         processed_info: dict,
         stream: bool,
         default_info: Dict[str, str],
-        ffmpeg_options: Dict[str, str],
-        ytdl: YoutubeDL,
-    ):
+    ) -> Track:
         info = default_info.copy()
         info.update(processed_info)
-        filename = (
-            processed_info["url"] if stream else ytdl.prepare_filename(processed_info)
-        )
-        logger.info(f"Creating new source {info.get('title')}, {filename}")
-        return cls(
-            discord.FFmpegPCMAudio(filename, **ffmpeg_options), ctx=ctx, data=info
-        )
+        track = Track(ctx, info)
+        if not stream:
+            track.set_url(
+                processed_info["_filename"], codec=processed_info.get("acodec")
+            )
+        elif processed_info.get("_type") != "url":
+            # flat playlist entries have no stream url yet, they are resolved later
+            track.set_url(processed_info["url"], codec=processed_info.get("acodec"))
+        return track
 
     @classmethod
     async def create_sources(
@@ -104,34 +374,57 @@ class AudioSource(discord.PCMVolumeTransformer):
         url: str,
         *,
         ctx: commands.Context,
-        loop: asyncio.AbstractEventLoop,
+        extractor: ExtractionService,
         default_info: Dict[str, str],
-        ffmpeg_options: Dict[str, str],
-        ytdl: YoutubeDL,
+        cache: MetadataCache | None = None,
         stream: bool = True,
+        lazy: bool = True,
     ):
-        data = await loop.run_in_executor(
-            None, lambda: ytdl.extract_info(url, download=not stream, process=True)
-        )
+        """
+        Extract the given url or search and yield a :class:`Track` for every found entry.
+        In lazy mode playlists are only extracted flat, so the tracks get yielded without
+        a stream url and must be resolved before they are played. On a cache hit the
+        extraction is skipped completely.
+        :param url:
+        :param ctx:
+        :param extractor:
+        :param default_info:
+        :param cache:
+        :param stream:
+        :param lazy:
+        :return:
+        """
+        if stream and cache is not None and (entries := await cache.get(url)):
+            for entry in entries:
+                track = cls._create_track(
+                    ctx=ctx,
+                    processed_info={"_type": "url", **entry},
+                    stream=stream,
+                    default_info=default_info,
+                )
+                await track.resolve_cached(cache)
+                yield track
+            return
+
+        if stream and lazy:
+            data = await extractor.extract_flat(ctx.guild.id, url)
+        else:
+            data = await extractor.extract(ctx.guild.id, url, download=not stream)
         if data is None:
             raise YTDLError(f"Couldn't find anything that matches `{url}`")
 
-        if "entries" not in data:
-            yield await cls._create_source(
+        entries = data["entries"] if "entries" in data else [data]
+        if stream and cache is not None:
+            await cache.put(url, entries)
+        for entry in entries:
+            track = cls._create_track(
                 ctx=ctx,
-                processed_info=data,
+                processed_info=entry,
                 stream=stream,
                 default_info=default_info,
-                ffmpeg_options=ffmpeg_options,
-                ytdl=ytdl,
             )
-        else:
-            for entry in data["entries"]:
-                yield await cls._create_source(
-                    ctx=ctx,
-                    processed_info=entry,
-                    stream=stream,
-                    default_info=default_info,
-                    ffmpeg_options=ffmpeg_options,
-                    ytdl=ytdl,
+            if stream and cache is not None and track.url is not None:
+                await cache.put_stream(
+                    track.web_page, track.url, track.expires, track.codec
                 )
+            yield track
@@ -5,15 +5,24 @@ from asyncio import timeout
 from typing import Coroutine, TYPE_CHECKING
 
 import discord
+import yt_dlp
 from discord.ext import commands
-from bot.cogs.music.online.youtube_dl import AudioSource
+from bot.cogs.music.online.youtube_dl import (
+    AudioSource,
+    Track,
+    YTDLError,
+    resolve_in_batches,
+)
+from bot.cogs.music.playlist import Playlist
+from bot.cogs.music.prefetch import Prefetcher
+from bot.config import config
 from bot.logger import logger
 
 if TYPE_CHECKING:
     import bot.cogs.music.music_cog as mc
 
 
-class MusicPlayer:
+class MusicPlayer:  # pylint: disable=too-many-instance-attributes
     __slots__ = (
         "bot",
         "guild",
@@ -24,36 +33,37 @@ class MusicPlayer:
         "current",
         "voice_client",
         "player_tasks",
+        "prefetcher",
+        "resolver",
+        "volume",
     )
     bot: commands.Bot
     guild: discord.Guild
     channel: discord.VoiceChannel
     cog: mc.Player | None
-    queue: asyncio.Queue[AudioSource]
+    queue: Playlist[Track]
     next: asyncio.Event
     current: AudioSource | None
     voice_client: discord.VoiceClient | None
     player_tasks: set | None
+    prefetcher: Prefetcher
+    resolver: asyncio.Task | None
+    volume: float
 
     def __init__(self, ctx: commands.Context):
         self.bot = ctx.bot
         self.guild = ctx.guild
         self.channel = ctx.channel
         self.cog = ctx.cog
-        self.queue = asyncio.Queue()
+        self.queue = Playlist()
         self.next = asyncio.Event()
         self.player_tasks = set()
+        self.prefetcher = Prefetcher(self)
+        self.resolver = None
+        self.volume = 1.0
+        self.current = None
         self.creat_referenced_task(self.player_loop())
 
-    async def get_playlist(self):
-        size = self.queue.qsize()
-        play_list = []
-        for _ in range(size):
-            source = await self.queue.get()
-            play_list.append(source)
-            await self.queue.put(source)
-        return play_list
-
     async def player_loop(self):
         await self.bot.wait_until_ready()
 
@@ -61,13 +71,24 @@ class MusicPlayer:
             self.next.clear()
             try:
                 async with timeout(100):
-                    audio_source = await self.queue.get()
+                    track = await self.queue.get()
             except asyncio.TimeoutError as e:
                 logger.error(f"cant get audio source from queue Timeout: {e}")
                 task = self.destroy(self.guild)
                 self.creat_referenced_task(task)
                 return task
 
+            audio_source = self.prefetcher.take(track)
+            if audio_source is not None and not audio_source.set_volume(self.volume):
+                audio_source.cleanup()
+                audio_source = None
+            if audio_source is None:
+                try:
+                    audio_source = await self.create_source(track)
+                except (YTDLError, yt_dlp.utils.DownloadError) as e:
+                    logger.error(f"cant create audio source for {track.title}: {e}")
+                    continue
+
             self.current = audio_source
             await self.bot.change_presence(activity=audio_source.to_activity())
             if self.voice_client is not None:
@@ -75,12 +96,14 @@ class MusicPlayer:
                     audio_source,
                     after=lambda error: (
                         logger.warning(f"error while playing: {error}", error),
+                        self.prefetcher.track_ended(),
                         self.creat_referenced_task(
                             self.bot.change_presence(activity=discord.Activity())
                         ),
                         self.bot.loop.call_soon_threadsafe(self.next.set),
                     ),
                 )
+                self.prefetcher.track_started(track)
                 logger.info(f"playing {self.current.title}")
                 await self.channel.send(embed=audio_source.to_embed(), delete_after=30)
             await self.next.wait()
@@ -90,10 +113,48 @@ class MusicPlayer:
                 logger.error(f"error while cleaning up audio source: {e}")
             self.current = None
 
-    def creat_referenced_task(self, coro: Coroutine):
+    async def create_source(self, track: Track) -> AudioSource:
+        return await AudioSource.from_track(
+            track,
+            extractor=self.cog.extractor,
+            cache=self.cog.cache,
+            track_cache=self.cog.track_cache,
+            broadcasts=self.cog.broadcasts,
+            ffmpeg_options=config.ffmpeg_options,
+            volume=self.volume,
+            passthrough=config.opus_passthrough,
+        )
+
+    def resolve_ahead(self):
+        """
+        Resolve the stream urls of the next tracks in the background, e.g. after a playlist
+        got queued
+        """
+        self.stop_resolving()
+        self.resolver = self.creat_referenced_task(
+            resolve_in_batches(
+                self.queue,
+                extractor=self.cog.extractor,
+                cache=self.cog.cache,
+                count=config.prefetch_count,
+                batch_size=config.playlist_batch_size,
+            )
+        )
+
+    def stop_resolving(self):
+        if self.resolver is not None:
+            self.resolver.cancel()
+            self.resolver = None
+
+    def close(self):
+        self.stop_resolving()
+        self.prefetcher.close()
+
+    def creat_referenced_task(self, coro: Coroutine) -> asyncio.Task:
         task = self.bot.loop.create_task(coro)
         self.player_tasks.add(task)
         task.add_done_callback(self.player_tasks.discard)
+        return task
 
     async def destroy(self, guild: discord.Guild):
         """Disconnect and cleanup the player."""
@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+import random
+from collections import deque
+from typing import Deque, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Playlist(Generic[T]):
+    """
+    Awaitable queue of the songs of a guild. Unlike asyncio.Queue it can be
+    viewed, paginated and rearranged without taking the items out.
+    """
+
+    __slots__ = ("items", "waiters", "_snapshot")
+    items: Deque[T]
+    waiters: Deque[asyncio.Future]
+    _snapshot: Tuple[T, ...] | None
+
+    def __init__(self):
+        self.items = deque()
+        self.waiters = deque()
+        self._snapshot = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def empty(self) -> bool:
+        return not self.items
+
+    def _changed(self):
+        self._snapshot = None
+
+    def _wakeup_next(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def put(self, item: T):
+        self.items.append(item)
+        self._changed()
+        self._wakeup_next()
+
+    async def get(self) -> T:
+        """
+        Remove and return the first item, wait until one is available if the playlist is empty
+        """
+        while not self.items:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                waiter.cancel()
+                try:
+                    self.waiters.remove(waiter)
+                except ValueError:
+                    pass
+                if self.items and not waiter.cancelled():
+                    self._wakeup_next()
+                raise
+        item = self.items.popleft()
+        self._changed()
+        return item
+
+    def snapshot(self) -> Tuple[T, ...]:
+        """
+        Immutable view of the playlist, it is only copied again after the playlist changed
+        """
+        if self._snapshot is None:
+            self._snapshot = tuple(self.items)
+        return self._snapshot
+
+    def page(self, start: int, stop: int) -> List[T]:
+        return list(itertools.islice(self.items, start, stop))
+
+    def peek(self, count: int) -> List[T]:
+        return self.page(0, count)
+
+    def remove(self, index: int) -> T:
+        """
+        Remove the item at the given index
+        :param index:
+        :return: the removed item
+        :raises IndexError: if the index is not in the playlist, negative indices included
+        """
+        if not 0 <= index < len(self.items):
+            raise IndexError(f"playlist index {index} out of range")
+        item = self.items[index]
+        del self.items[index]
+        self._changed()
+        return item
+
+    def move(self, source: int, destination: int) -> T:
+        """
+        Move the item at index source to index destination
+        :param source:
+        :param destination:
+        :return: the moved item
+        :raises IndexError: if one of the indices is not in the playlist, negative indices included
+        """
+        if not 0 <= destination < len(self.items):
+            raise IndexError(f"playlist index {destination} out of range")
+        item = self.remove(source)
+        self.items.insert(destination, item)
+        return item
+
+    def shuffle(self):
+        items = list(self.items)
+        random.shuffle(items)
+        self.items = deque(items)
+        self._changed()
+
+    def clear(self) -> int:
+        """
+        Remove all items
+        :return: the number of removed items
+        """
+        count = len(self.items)
+        self.items.clear()
+        self._changed()
+        return count
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+import yt_dlp
+
+from bot.cogs.music.online.youtube_dl import AudioSource, Track, YTDLError
+from bot.config import config
+from bot.logger import logger
+from bot.metrics import Metric
+
+if TYPE_CHECKING:
+    from bot.cogs.music.player import MusicPlayer
+
+
+class Prefetcher:
+    """
+    Resolves the stream urls of the next queued tracks while the current track plays and
+    starts the ffmpeg process of the next track shortly before the current one ends.
+    """
+
+    __slots__ = ("player", "warm", "task", "ended_at", "gaps")
+    player: MusicPlayer
+    warm: AudioSource | None
+    task: asyncio.Task | None
+    ended_at: float | None
+    gaps: Metric
+
+    def __init__(self, player: MusicPlayer):
+        self.player = player
+        self.warm = None
+        self.task = None
+        self.ended_at = None
+        self.gaps = Metric("gap between tracks")
+
+    def take(self, track: Track) -> AudioSource | None:
+        """
+        Get the warmed up source, if it belongs to the given track
+        :param track:
+        :return:
+        """
+        source, self.warm = self.warm, None
+        if source is not None and source.track is not track:
+            source.cleanup()
+            return None
+        return source
+
+    def track_started(self, track: Track):
+        if self.ended_at is not None:
+            gap = time.perf_counter() - self.ended_at
+            self.gaps.record(gap)
+            logger.info(
+                f"gap before {track.title} was {gap * 1000:.0f} ms ({self.gaps.summary()})"
+            )
+            self.ended_at = None
+        if self.task is not None:
+            self.task.cancel()
+        self.task = self.player.creat_referenced_task(self.run(track))
+
+    def track_ended(self):
+        """
+        Called from the voice thread, when a track finished. Only measure the gap
+        if there is a next track waiting in the queue.
+        """
+        self.ended_at = time.perf_counter() if not self.player.queue.empty() else None
+
+    async def run(self, current: Track):
+        for track in self.player.queue.peek(config.prefetch_count):
+            try:
+                await track.resolve(self.player.cog.extractor, self.player.cog.cache)
+            except (YTDLError, yt_dlp.utils.DownloadError) as e:
+                logger.warning(f"prefetching {track.title} failed: {e}")
+        if current.duration is None:
+            return
+        await asyncio.sleep(max(0, current.duration - config.prefetch_warmup))
+        await self.warm_up()
+
+    async def warm_up(self):
+        """
+        Start the ffmpeg process of the next track in the queue
+        """
+        if not (head := self.player.queue.peek(1)):
+            return
+        if self.warm is not None:
+            if self.warm.track is head[0]:
+                return
+            self.warm.cleanup()
+            self.warm = None
+        try:
+            self.warm = await self.player.create_source(head[0])
+            logger.info(f"warmed up {head[0].title}")
+        except (YTDLError, yt_dlp.utils.DownloadError) as e:
+            logger.warning(f"warming up {head[0].title} failed: {e}")
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.warm is not None:
+            self.warm.cleanup()
+            self.warm = None
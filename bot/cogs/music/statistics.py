@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models.musicplayer import (
+    DailyPlays,
+    SongRequest,
+    TrackPlays,
+    UserPlays,
+)
+
+
+async def record_plays(session: AsyncSession, requests: List[SongRequest]):
+    """
+    Add a batch of song requests to the rollup tables, in the same transaction as the requests
+    :param session:
+    :param requests:
+    :return:
+    """
+    if not requests:
+        return
+    daily: Dict[Tuple, Dict[str, Any]] = {}
+    tracks: Dict[Tuple, Dict[str, Any]] = {}
+    users: Dict[Tuple, Dict[str, Any]] = {}
+    for request in requests:
+        server_id, requester_id = str(request.server_id), str(request.requester_id)
+        day = request.date.date()
+        row = daily.setdefault(
+            (server_id, day, request.web_page, requester_id),
+            {
+                "server_id": server_id,
+                "day": day,
+                "web_page": request.web_page,
+                "requester_id": requester_id,
+                "plays": 0,
+            },
+        )
+        row["title"] = request.title
+        row["plays"] += 1
+
+        row = tracks.setdefault(
+            (server_id, request.web_page),
+            {
+                "server_id": server_id,
+                "web_page": request.web_page,
+                "title": request.title,
+                "plays": 0,
+                "last_played": request.date,
+            },
+        )
+        row["plays"] += 1
+        if request.date >= row["last_played"]:
+            row["title"] = request.title
+            row["last_played"] = request.date
+
+        row = users.setdefault(
+            (server_id, requester_id),
+            {
+                "server_id": server_id,
+                "requester_id": requester_id,
+                "plays": 0,
+                "first_played": request.date,
+                "last_played": request.date,
+            },
+        )
+        row["plays"] += 1
+        row["first_played"] = min(row["first_played"], request.date)
+        row["last_played"] = max(row["last_played"], request.date)
+
+    statement = insert(DailyPlays)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["server_id", "day", "web_page", "requester_id"],
+            set_={
+                "title": statement.excluded.title,
+                "plays": DailyPlays.plays + statement.excluded.plays,
+            },
+        ),
+        list(daily.values()),
+    )
+    statement = insert(TrackPlays)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["server_id", "web_page"],
+            set_={
+                "title": statement.excluded.title,
+                "plays": TrackPlays.plays + statement.excluded.plays,
+                "last_played": func.max(
+                    TrackPlays.last_played, statement.excluded.last_played
+                ),
+            },
+        ),
+        list(tracks.values()),
+    )
+    statement = insert(UserPlays)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["server_id", "requester_id"],
+            set_={
+                "plays": UserPlays.plays + statement.excluded.plays,
+                "first_played": func.min(
+                    UserPlays.first_played, statement.excluded.first_played
+                ),
+                "last_played": func.max(
+                    UserPlays.last_played, statement.excluded.last_played
+                ),
+            },
+        ),
+        list(users.values()),
+    )
@@ -0,0 +1,182 @@
+import datetime
+
+import discord
+from discord.ext import commands, tasks
+from sqlalchemy import delete, func, select
+
+from bot.config import config
+from bot.database.database import async_session
+from bot.database.models.musicplayer import (
+    DailyPlays,
+    SongRequest,
+    TrackPlays,
+    UserPlays,
+)
+from bot.logger import logger
+
+
+class Statistics(commands.Cog):
+    """
+    Statistics about the requested songs. The commands read the rollup tables, which are
+    updated together with the inserted song requests, so they don't have to scan all requests.
+    """
+
+    __slots__ = ("bot",)
+
+    bot: commands.Bot
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_load(self) -> None:
+        # pylint: disable=no-member
+        self.retention_task.start()
+
+    def cog_check(self, ctx: commands.Context) -> bool:
+        if not ctx.guild:
+            raise commands.NoPrivateMessage
+        return True
+
+    @commands.command(name="top")
+    async def top(self, ctx: commands.Context, days: int = None):
+        """Shows the most requested songs of the server, optionally only of the last days."""
+        server_id = str(ctx.guild.id)
+        async with async_session() as session:
+            if days is None:
+                rows = (
+                    await session.execute(
+                        select(TrackPlays.title, TrackPlays.web_page, TrackPlays.plays)
+                        .where(TrackPlays.server_id == server_id)
+                        .order_by(TrackPlays.plays.desc())
+                        .limit(config.statistics_size)
+                    )
+                ).all()
+            else:
+                since = datetime.date.today() - datetime.timedelta(days=max(days, 1))
+                plays = func.sum(DailyPlays.plays).label("plays")
+                rows = (
+                    await session.execute(
+                        select(func.max(DailyPlays.title), DailyPlays.web_page, plays)
+                        .where(DailyPlays.server_id == server_id)
+                        .where(DailyPlays.day > since)
+                        .group_by(DailyPlays.web_page)
+                        .order_by(plays.desc())
+                        .limit(config.statistics_size)
+                    )
+                ).all()
+        heading = "Meistgewünschte Durchsagen"
+        if days is not None:
+            heading += f" der letzten {max(days, 1)} Tage"
+        embed = discord.Embed(title=heading, color=discord.Color.blurple())
+        embed.description = (
+            "\n".join(
+                f"__{index}__. [{title}]({web_page}) - {plays}x"
+                for index, (title, web_page, plays) in enumerate(rows, start=1)
+            )
+            or "Es wurden noch keine Durchsagen gewünscht"
+        )
+        await ctx.send(embed=embed, delete_after=60)
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="history")
+    async def history(self, ctx: commands.Context, count: int = None):
+        """Shows the last requested songs of the server."""
+        count = min(max(count or config.statistics_size, 1), 25)
+        async with async_session() as session:
+            requests = (
+                await session.scalars(
+                    select(SongRequest)
+                    .where(SongRequest.server_id == str(ctx.guild.id))
+                    .order_by(SongRequest.date.desc())
+                    .limit(count)
+                )
+            ).all()
+        embed = discord.Embed(title="Letzte Durchsagen", color=discord.Color.blurple())
+        embed.description = (
+            "\n".join(
+                f"{request.date:%d.%m.%Y %H:%M} [{request.title}]({request.web_page}) von <@{request.requester_id}>"
+                for request in requests
+            )
+            or "Es wurden noch keine Durchsagen gewünscht"
+        )
+        await ctx.send(embed=embed, delete_after=60)
+        await ctx.message.delete(delay=10)
+
+    @commands.command(name="stats")
+    async def stats(self, ctx: commands.Context, member: discord.Member = None):
+        """Shows how many songs a member requested, by default the author."""
+        member = member or ctx.author
+        server_id, requester_id = str(ctx.guild.id), str(member.id)
+        week = datetime.date.today() - datetime.timedelta(days=7)
+        month = datetime.date.today() - datetime.timedelta(days=30)
+        embed = discord.Embed(
+            title=f"Statistik von {member.display_name}", color=discord.Color.blurple()
+        )
+        async with async_session() as session:
+            user = await session.get(UserPlays, (server_id, requester_id))
+            if user is None:
+                embed.description = (
+                    f"{member.display_name} hat noch keine Durchsagen gewünscht"
+                )
+                await ctx.send(embed=embed, delete_after=60)
+                await ctx.message.delete(delay=10)
+                return
+            rank = await session.scalar(
+                select(func.count())
+                .select_from(UserPlays)
+                .where(UserPlays.server_id == server_id)
+                .where(UserPlays.plays > user.plays)
+            )
+            recent = await session.scalar(
+                select(func.sum(DailyPlays.plays))
+                .where(DailyPlays.server_id == server_id)
+                .where(DailyPlays.requester_id == requester_id)
+                .where(DailyPlays.day > week)
+            )
+            favourite = (
+                await session.execute(
+                    select(func.max(DailyPlays.title), DailyPlays.web_page)
+                    .where(DailyPlays.server_id == server_id)
+                    .where(DailyPlays.requester_id == requester_id)
+                    .where(DailyPlays.day > month)
+                    .group_by(DailyPlays.web_page)
+                    .order_by(func.sum(DailyPlays.plays).desc())
+                    .limit(1)
+                )
+            ).first()
+        embed.add_field(name="Durchsagen", value=user.plays)
+        embed.add_field(name="Platz", value=rank + 1)
+        embed.add_field(name="Letzte 7 Tage", value=recent or 0)
+        embed.add_field(name="Erste Durchsage", value=f"{user.first_played:%d.%m.%Y}")
+        embed.add_field(name="Letzte Durchsage", value=f"{user.last_played:%d.%m.%Y}")
+        if favourite is not None:
+            embed.add_field(
+                name="Lieblingsdurchsage (30 Tage)",
+                value=f"[{favourite[0]}]({favourite[1]})",
+                inline=False,
+            )
+        await ctx.send(embed=embed, delete_after=60)
+        await ctx.message.delete(delay=10)
+
+    @tasks.loop(hours=24)
+    async def retention_task(self):
+        """
+        Delete song requests older than the retention, they are still counted in the rollups
+        """
+        before = datetime.datetime.now() - datetime.timedelta(
+            days=config.request_retention
+        )
+        async with async_session() as session:
+            result = await session.execute(
+                delete(SongRequest).where(SongRequest.date < before)
+            )
+            await session.commit()
+        logger.info(f"deleted {result.rowcount} song requests older than {before}")
+
+    async def cog_unload(self) -> None:
+        # pylint: disable=no-member
+        self.retention_task.cancel()
+
+
+async def setup(client: commands.Bot) -> None:
+    await client.add_cog(Statistics(client))
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import discord
+import httpx
+from mvg_api.v1.api import RequestFailed
+from mvg_api.v1.mvg import AsyncMVG
+from mvg_api.v1.schemas.ticker import SlimList, Ticker, TickerList
+from pydantic import ValidationError
+
+from bot.logger import logger
+
+FETCH_ERRORS = (httpx.HTTPError, RequestFailed, ValidationError)
+
+
+class SnapshotCache:
+    """
+    Keeps the last response of each fetch for ttl seconds. Concurrent callers of an expired
+    snapshot wait for a single fetch, and if it fails they get the expired snapshot instead,
+    which is then served for another ttl before the next fetch is tried.
+    """
+
+    __slots__ = ("ttl", "snapshots", "fetches", "hits", "coalesced", "stale")
+    ttl: float
+    snapshots: Dict[str, Tuple[float, Any]]
+    fetches: Dict[str, asyncio.Future]
+    hits: int
+    coalesced: int
+    stale: int
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.snapshots = {}
+        self.fetches = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.stale = 0
+
+    def summary(self) -> str:
+        return (
+            f"mvg cache: {self.hits} hits, {self.coalesced} coalesced,"
+            f" {self.stale} stale"
+        )
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+        except FETCH_ERRORS as e:
+            if (snapshot := self.snapshots.get(key)) is None:
+                raise
+            self.stale += 1
+            logger.warning(f"Fetching {key} failed, serving the last snapshot: {e!r}")
+            # back off for ttl, an outage must not cost a fetch per call
+            self.snapshots[key] = (time.monotonic(), snapshot[1])
+            return snapshot[1]
+        finally:
+            del self.fetches[key]
+        self.snapshots[key] = (time.monotonic(), value)
+        return value
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a snapshot, fetching it if it is older than ttl
+        :param key: name of the snapshot
+        :param fetch: coroutine function fetching the snapshot
+        :return:
+        """
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None and time.monotonic() - snapshot[0] < self.ttl:
+            self.hits += 1
+            return snapshot[1]
+        if (future := self.fetches.get(key)) is None:
+            future = self.fetches[key] = asyncio.ensure_future(
+                self._refresh(key, fetch)
+            )
+        else:
+            self.coalesced += 1
+        # a cancelled caller must not cancel the fetch the others wait for
+        return await asyncio.shield(future)
+
+
+class CachedMVG(AsyncMVG):
+    """
+    AsyncMVG with the ticker and the slim list served from a shared SnapshotCache
+    """
+
+    cache: SnapshotCache
+
+    def __init__(self, ttl: float):
+        super().__init__()
+        self.cache = SnapshotCache(ttl)
+
+    async def get_ticker(self) -> TickerList:
+        return await self.cache.get("ticker", super().get_ticker)
+
+    async def get_slim(self) -> SlimList:
+        return await self.cache.get("slim", super().get_slim)
+
+
+class RenderCache:
+    """
+    LRU of rendered tickers. The key is the ticker id and a hash of its content, so a ticker
+    is rendered again once it changes. The embed is kept as a dict, its description is the
+    markdown converted from the html of the ticker.
+    """
+
+    __slots__ = ("size", "embeds", "hits", "misses")
+    size: int
+    embeds: OrderedDict[Tuple[str, str], Dict[str, Any]]
+    hits: int
+    misses: int
+
+    def __init__(self, size: int):
+        self.size = size
+        self.embeds = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self) -> str:
+        return f"ticker render cache: {self.hits} hits, {self.misses} misses"
+
+    def render(
+        self, ticker: Ticker, render: Callable[[Ticker], discord.Embed]
+    ) -> discord.Embed:
+        """
+        Render a ticker or reuse the embed of an unchanged one
+        :param ticker:
+        :param render: uncached renderer
+        :return: a new embed, that may be changed by the caller
+        """
+        key = (ticker.id, hashlib.sha1(ticker.model_dump_json().encode()).hexdigest())
+        if (embed := self.embeds.get(key)) is not None:
+            self.hits += 1
+            self.embeds.move_to_end(key)
+        else:
+            self.misses += 1
+            embed = self.embeds[key] = render(ticker).to_dict()
+            while len(self.embeds) > self.size:
+                self.embeds.popitem(last=False)
+        return discord.Embed.from_dict(embed)
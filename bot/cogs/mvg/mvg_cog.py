@@ -1,15 +1,17 @@
 import datetime
+import hashlib
+import json
 
 import discord
-import httpx
 from discord.ext import commands, tasks
 from mvg_api.v1.schemas.ticker import Ticker
-from mvg_api.v1.mvg import AsyncMVG
-from sqlalchemy import delete
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
 from markdownify import MarkdownConverter
 
-from bot.database.database import engine
+from bot.cogs.mvg.cache import FETCH_ERRORS, CachedMVG, RenderCache
+from bot.cogs.shared.schedule import AdaptiveInterval
+from bot.config import config
+from bot.database.database import async_session
 from bot.database.models.mvg import RegisteredChannelWithMessageId
 from bot.logger import logger
 
@@ -41,16 +43,40 @@ class TypeOfTransportConverter(commands.Converter):
 md = MyMarkdownConverter(bullets=[">"])
 
 
+def slim_hash(embed: discord.Embed) -> str:
+    """
+    Hash of the content of a slim embed, the timestamp of the last update is ignored
+    :param embed:
+    :return:
+    """
+    content = embed.to_dict()
+    content.pop("timestamp", None)
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
 class MVGCog(commands.Cog):
-    __slots__ = ("bot", "station")
+    __slots__ = ("bot", "station", "interval", "last_hash", "renders")
 
     bot: commands.Bot
-    api: AsyncMVG
+    api: CachedMVG
+    interval: AdaptiveInterval
+    last_hash: str | None
+    renders: RenderCache
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.api = AsyncMVG()
-        self.session = Session(engine)
+        # !meldungen and update_slim share the snapshots of the ticker and the slim list
+        self.api = CachedMVG(config.mvg_cache_ttl)
+        self.interval = AdaptiveInterval(
+            floor=config.slim_min_interval * 60,
+            ceiling=config.slim_max_interval * 60,
+            quiet_interval=config.slim_quiet_interval * 60,
+            quiet_start=config.slim_quiet_start,
+            quiet_end=config.slim_quiet_end,
+            timezone=config.slim_timezone,
+        )
+        self.last_hash = None
+        self.renders = RenderCache(config.ticker_cache_size)
         # pylint: disable=no-member
         self.update_slim.start()
 
@@ -63,11 +89,9 @@ class MVGCog(commands.Cog):
         :return:
         """
         channel_id = ctx.message.channel.id
-        if (
-            self.session.query(RegisteredChannelWithMessageId)
-            .filter_by(id=channel_id)
-            .first()
-        ):
+        async with async_session() as session:
+            subscribed = await session.get(RegisteredChannelWithMessageId, channel_id)
+        if subscribed is not None:
             logger.warning(
                 f"Channel {ctx.channel.name} is already subscribed to station of the day"
             )
@@ -75,11 +99,17 @@ class MVGCog(commands.Cog):
                 f"Kanal {ctx.channel.name} ist schon angemeldet", delete_after=10
             )
         else:
-            message = await ctx.send(embed=await self.generate_slim())
-            self.session.add(
-                RegisteredChannelWithMessageId(id=channel_id, message_id=message.id)
-            )
-            self.session.commit()
+            slim = await self.generate_slim()
+            message = await ctx.send(embed=slim)
+            async with async_session() as session:
+                session.add(
+                    RegisteredChannelWithMessageId(
+                        id=channel_id,
+                        message_id=message.id,
+                        content_hash=slim_hash(slim),
+                    )
+                )
+                await session.commit()
             logger.info(f"Channel {ctx.channel.name} subscribed to slim message ticker")
             await ctx.send(
                 f"Kanal {ctx.channel.name} ist angemeldet, für MVG Störungs Ticker",
@@ -96,12 +126,11 @@ class MVGCog(commands.Cog):
         :return:
         """
         channel_id = ctx.message.channel.id
-        if (
-            self.session.query(RegisteredChannelWithMessageId)
-            .filter_by(id=channel_id)
-            .first()
-            is None
-        ):
+        async with async_session() as session:
+            message_from_db = await session.get(
+                RegisteredChannelWithMessageId, channel_id
+            )
+        if message_from_db is None:
             logger.warning(
                 f"Channel {ctx.channel.name} is not subscribed to mvg ticker, unsubscribe not possible"
             )
@@ -110,21 +139,16 @@ class MVGCog(commands.Cog):
                 delete_after=10,
             )
         else:
-            message_from_db = (
-                self.session.query(RegisteredChannelWithMessageId)
-                .filter_by(id=channel_id)
-                .first()
-            )
-            message = await self.bot.get_channel(channel_id).fetch_message(
+            await self.bot.get_partial_messageable(channel_id).get_partial_message(
                 message_from_db.message_id
-            )
-            await message.delete()
-            self.session.execute(
-                delete(RegisteredChannelWithMessageId).where(
-                    RegisteredChannelWithMessageId.id == channel_id
+            ).delete()
+            async with async_session() as session:
+                await session.execute(
+                    delete(RegisteredChannelWithMessageId).where(
+                        RegisteredChannelWithMessageId.id == channel_id
+                    )
                 )
-            )
-            self.session.commit()
+                await session.commit()
             logger.info(f"Channel {ctx.channel.name} unsubscribed mvg ticker")
             await ctx.send(
                 f"Kanal {ctx.channel.name} ist abgemeldet, für MVG störungs ticker",
@@ -135,7 +159,7 @@ class MVGCog(commands.Cog):
     async def generate_slim(self) -> discord.Embed:
         try:
             slim_list = await self.api.get_slim()
-        except httpx.HTTPError as e:
+        except FETCH_ERRORS as e:
             logger.error(f"Error while fetching slim list: {e}")
             return discord.Embed(
                 colour=discord.Colour.red(),
@@ -183,11 +207,22 @@ class MVGCog(commands.Cog):
         type_of: TypeOfTransportConverter = None,
         line: str = None,
     ):
-        tickers = await self.api.get_ticker()
-        for ticker in tickers.__root__:
+        try:
+            tickers = await self.api.get_ticker()
+        except FETCH_ERRORS as e:
+            logger.error(f"Error while fetching the ticker: {e}")
+            await ctx.send(
+                "Es ist ein Fehler aufgetreten, bitte versuchen sie es später erneut",
+                delete_after=10,
+            )
+            await ctx.message.delete(delay=10)
+            return
+        logger.info(self.api.cache.summary())
+        for ticker in tickers.root:
             if self.check_type_of_transport(type_of, line, ticker):
-                embed = self.ticker_to_embed(ticker)
+                embed = self.renders.render(ticker, self.ticker_to_embed)
                 await ctx.send(embed=embed, delete_after=90)
+        logger.info(self.renders.summary())
         await ctx.message.delete(delay=10)
 
     def check_type_of_transport(self, type_of: str, line_id: str, ticker: Ticker):
@@ -242,21 +277,53 @@ class MVGCog(commands.Cog):
     async def update_slim(self):
         logger.info("updating slim")
         slim = await self.generate_slim()
-        for channel_id_message_id in self.session.query(
-            RegisteredChannelWithMessageId
-        ).all():
-            channel = self.bot.get_channel(channel_id_message_id.id)
+        content_hash = slim_hash(slim)
+        # poll more often while the disruptions change, the first poll counts as a change
+        seconds = self.interval.next(
+            content_hash != self.last_hash, datetime.datetime.now(datetime.timezone.utc)
+        )
+        self.last_hash = content_hash
+        self.update_slim.change_interval(seconds=seconds)
+        logger.info(
+            f"next slim update in {seconds / 60:.1f}min, {self.interval.summary()}"
+        )
+        async with async_session() as session:
+            channels = (
+                await session.scalars(select(RegisteredChannelWithMessageId))
+            ).all()
+        changed = [
+            channel for channel in channels if channel.content_hash != content_hash
+        ]
+        edited = []
+        for channel_id_message_id in changed:
+            # a partial message can be edited without fetching it first
+            message = self.bot.get_partial_messageable(
+                channel_id_message_id.id
+            ).get_partial_message(channel_id_message_id.message_id)
             try:
-                message = await channel.fetch_message(channel_id_message_id.message_id)
-            except discord.NotFound as e:
+                await message.edit(embed=slim)
+            except (discord.NotFound, discord.Forbidden) as e:
                 logger.error(
-                    f"Error while fetching message {channel_id_message_id.message_id} in channel {channel.id}: {e}"
+                    f"Error while editing message {message.id} in channel {channel_id_message_id.id}: {e}"
                 )
                 continue
             logger.info(
-                f"Updating Slim in channel {channel.name} with message {message.id}"
+                f"Updated Slim in channel {channel_id_message_id.id} with message {message.id}"
             )
-            await message.edit(embed=slim)
+            edited.append(channel_id_message_id.id)
+        if edited:
+            async with async_session() as session:
+                await session.execute(
+                    update(RegisteredChannelWithMessageId)
+                    .where(RegisteredChannelWithMessageId.id.in_(edited))
+                    .values(content_hash=content_hash)
+                )
+                await session.commit()
+        # every channel used to cost a fetch and an edit
+        logger.info(
+            f"slim update: {len(edited)} of {len(channels)} messages edited,"
+            f" {2 * len(channels) - len(changed)} api calls saved"
+        )
 
     @update_slim.before_loop
     async def before_my_task(self):
@@ -0,0 +1,133 @@
+import asyncio
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+import aiohttp
+import discord
+
+from bot.logger import logger
+from bot.metrics import Metric
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Errors worth a retry, discord.py already waits for the rate limits before it gives up with 429
+    """
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class Broadcaster:
+    """
+    Sends the same messages to many channels. At most concurrency channels are sent to at
+    once, the messages of a channel are sent one after another, as they share its rate limit
+    bucket. Transient failures are retried with backoff, channels that are gone or forbidden
+    are handed to the prune callback, so they can be unsubscribed.
+    """
+
+    __slots__ = ("bot", "concurrency", "retries", "locks", "latency")
+    bot: discord.Client
+    concurrency: int
+    retries: int
+    locks: weakref.WeakValueDictionary[int, asyncio.Lock]
+    latency: Metric
+
+    def __init__(self, bot: discord.Client, concurrency: int, retries: int):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.retries = retries
+        self.locks = weakref.WeakValueDictionary()
+        self.latency = Metric("broadcast delivery")
+
+    def _lock(self, channel_id: int) -> asyncio.Lock:
+        if (lock := self.locks.get(channel_id)) is None:
+            lock = self.locks[channel_id] = asyncio.Lock()
+        return lock
+
+    async def _send(self, channel: discord.PartialMessageable, message: Dict[str, Any]):
+        for attempt in range(self.retries + 1):
+            try:
+                await channel.send(**message)
+                return
+            except (discord.Forbidden, discord.NotFound):
+                raise
+            except (
+                discord.HTTPException,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+            ) as e:
+                if not is_transient(e) or attempt == self.retries:
+                    raise
+                logger.warning(
+                    f"Sending to channel {channel.id} failed, attempt {attempt + 1}: {e!r}"
+                )
+                await asyncio.sleep(random.uniform(0, 2**attempt))
+
+    async def _deliver(
+        self,
+        channel_id: int,
+        messages: List[Dict[str, Any]],
+        semaphore: asyncio.Semaphore,
+        start: float,
+    ) -> bool:
+        """
+        Send the messages to a channel
+        :return: False if the channel is gone or the bot may not post in it
+        """
+        channel = self.bot.get_partial_messageable(channel_id)
+        # the lock serializes broadcasts to the same channel, e.g. a post and a feed update
+        async with semaphore, self._lock(channel_id):
+            try:
+                for message in messages:
+                    await self._send(channel, message)
+            except (discord.Forbidden, discord.NotFound) as e:
+                logger.warning(f"Can't send to channel {channel_id}: {e}")
+                return False
+            except (
+                discord.HTTPException,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+            ) as e:
+                logger.error(f"Sending to channel {channel_id} failed: {e!r}")
+                return True
+        self.latency.record(time.perf_counter() - start)
+        return True
+
+    async def broadcast(
+        self,
+        channel_ids: Iterable[int],
+        messages: List[Dict[str, Any]],
+        prune: Callable[[List[int]], Awaitable[None]] | None = None,
+    ) -> List[int]:
+        """
+        Send the messages to every channel
+        :param channel_ids:
+        :param messages: keyword arguments of channel.send, sent in order
+        :param prune: called with the channels that are gone or forbidden
+        :return: the pruned channels
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        channel_ids = list(channel_ids)
+        delivered = await asyncio.gather(
+            *(
+                self._deliver(channel_id, messages, semaphore, start)
+                for channel_id in channel_ids
+            )
+        )
+        pruned = [
+            channel_id
+            for channel_id, reachable in zip(channel_ids, delivered)
+            if not reachable
+        ]
+        if pruned and prune is not None:
+            await prune(pruned)
+        logger.info(
+            f"broadcast to {len(channel_ids)} channels in {time.perf_counter() - start:.1f}s,"
+            f" {len(pruned)} pruned"
+        )
+        logger.info(self.latency.summary())
+        return pruned
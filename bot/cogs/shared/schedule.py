@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from bot.metrics import Metric
+
+
+class AdaptiveInterval:
+    """
+    Interval of a polling loop. After a poll that saw a change the interval drops to the floor,
+    every poll without a change doubles it up to the ceiling. During the quiet hours the
+    interval is at least quiet_interval, but the first poll after them is not delayed.
+    """
+
+    __slots__ = (
+        "floor",
+        "ceiling",
+        "quiet_interval",
+        "quiet_start",
+        "quiet_end",
+        "timezone",
+        "seconds",
+        "polls",
+        "changes",
+        "intervals",
+    )
+    floor: float
+    ceiling: float
+    quiet_interval: float
+    quiet_start: time
+    quiet_end: time
+    timezone: ZoneInfo
+    seconds: float
+    polls: int
+    changes: int
+    intervals: Metric
+
+    def __init__(
+        self,
+        *,
+        floor: float,
+        ceiling: float,
+        quiet_interval: float,
+        quiet_start: time,
+        quiet_end: time,
+        timezone: str,
+    ):
+        """
+        :param floor: shortest interval in seconds
+        :param ceiling: longest interval in seconds outside the quiet hours
+        :param quiet_interval: shortest interval in seconds during the quiet hours
+        :param quiet_start: local time the quiet hours start
+        :param quiet_end: local time the quiet hours end, may be after midnight
+        :param timezone: of the quiet hours, e.g. Europe/Berlin
+        """
+        self.floor = floor
+        self.ceiling = ceiling
+        self.quiet_interval = quiet_interval
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+        self.timezone = ZoneInfo(timezone)
+        self.seconds = floor
+        self.polls = 0
+        self.changes = 0
+        self.intervals = Metric("poll interval")
+
+    @property
+    def change_rate(self) -> float:
+        if self.polls == 0:
+            return 0.0
+        return self.changes / self.polls
+
+    def quiet_until(self, now: datetime) -> datetime | None:
+        """
+        :param now: timezone aware
+        :return: the end of the quiet hours, None if now is outside of them
+        """
+        local = now.astimezone(self.timezone)
+        current = local.time()
+        if self.quiet_start <= self.quiet_end:
+            quiet = self.quiet_start <= current < self.quiet_end
+        else:
+            quiet = current >= self.quiet_start or current < self.quiet_end
+        if not quiet:
+            return None
+        end = datetime.combine(local.date(), self.quiet_end, self.timezone)
+        if end <= local:
+            end += timedelta(days=1)
+        return end
+
+    def next(self, changed: bool, now: datetime) -> float:
+        """
+        Record a poll and compute the interval until the next one
+        :param changed: if the poll saw a change
+        :param now: timezone aware
+        :return: seconds until the next poll
+        """
+        self.polls += 1
+        if changed:
+            self.changes += 1
+            self.seconds = self.floor
+        else:
+            self.seconds = min(self.seconds * 2, self.ceiling)
+        seconds = self.seconds
+        if (end := self.quiet_until(now)) is not None:
+            seconds = max(
+                self.floor,
+                min(max(seconds, self.quiet_interval), (end - now).total_seconds()),
+            )
+        self.intervals.record(seconds)
+        return seconds
+
+    def summary(self) -> str:
+        return (
+            f"{self.polls} polls, change rate {self.change_rate:.0%},"
+            f" {self.intervals.summary(unit='min', scale=1 / 60)}"
+        )
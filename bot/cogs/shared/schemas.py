@@ -1,4 +1,5 @@
-from typing import Dict
+from datetime import time
+from typing import Dict, Literal
 
 from pydantic import BaseModel, Field, HttpUrl
 
@@ -25,6 +26,32 @@ class Config(BaseModel):
     )
     options: str = Field(default="-vn", alias="OPTIONS")
 
+    opus_passthrough: bool = Field(default=True, alias="OPUS_PASSTHROUGH")
+    broadcast: bool = Field(default=False, alias="BROADCAST")
+    broadcast_buffer: int = Field(default=250, alias="BROADCAST_BUFFER")
+
+    write_batch_size: int = Field(default=50, alias="WRITE_BATCH_SIZE")
+    write_interval: int = Field(default=500, alias="WRITE_INTERVAL")
+    request_retention: int = Field(default=90, alias="REQUEST_RETENTION")
+    statistics_size: int = Field(default=10, alias="STATISTICS_SIZE")
+
+    playlist_batch_size: int = Field(default=5, alias="PLAYLIST_BATCH_SIZE")
+    prefetch_count: int = Field(default=3, alias="PREFETCH_COUNT")
+    prefetch_warmup: int = Field(default=5, alias="PREFETCH_WARMUP")
+    extractor_workers: int = Field(default=4, alias="EXTRACTOR_WORKERS")
+    extractor_mode: Literal["thread", "process"] = Field(
+        default="thread", alias="EXTRACTOR_MODE"
+    )
+    metadata_cache_size: int = Field(default=1024, alias="METADATA_CACHE_SIZE")
+    metadata_cache_ttl: int = Field(default=168, alias="METADATA_CACHE_TTL")
+    offline_cache_directory: str = Field(
+        default="config/audio", alias="OFFLINE_CACHE_DIRECTORY"
+    )
+    offline_cache_size: int = Field(default=2048, alias="OFFLINE_CACHE_SIZE")
+    offline_cache_min_plays: int = Field(default=3, alias="OFFLINE_CACHE_MIN_PLAYS")
+    offline_cache_tracks: int = Field(default=20, alias="OFFLINE_CACHE_TRACKS")
+    offline_cache_interval: int = Field(default=6, alias="OFFLINE_CACHE_INTERVAL")
+
     uploader: str = Field(default="Max Raabe & Palast Orchester", alias="UPLOADER")
     uploader_url: HttpUrl = Field(
         default="https://www.youtube.com/channel/UCXh3cIvGrgFnYYDV4Bzru0Q",
@@ -45,6 +72,30 @@ class Config(BaseModel):
     )
 
     hour: int = Field(default=12, enaliasv="HOUR")
+    station_sync_interval: int = Field(default=24, alias="STATION_SYNC_INTERVAL")
+    nearby_count: int = Field(default=5, alias="NEARBY_COUNT")
+    search_count: int = Field(default=5, alias="SEARCH_COUNT")
+    photo_feed_interval: int = Field(default=30, alias="PHOTO_FEED_INTERVAL")
+    photo_feed_max_hours: int = Field(default=24, alias="PHOTO_FEED_MAX_HOURS")
+    post_concurrency: int = Field(default=8, alias="POST_CONCURRENCY")
+    post_retries: int = Field(default=3, alias="POST_RETRIES")
+    station_fetch_concurrency: int = Field(default=4, alias="STATION_FETCH_CONCURRENCY")
+    station_fetch_timeout: float = Field(default=10, alias="STATION_FETCH_TIMEOUT")
+    station_fetch_retries: int = Field(default=2, alias="STATION_FETCH_RETRIES")
+    station_fetch_deadline: float = Field(default=60, alias="STATION_FETCH_DEADLINE")
+    http_cache_directory: str = Field(
+        default="config/http", alias="HTTP_CACHE_DIRECTORY"
+    )
+    http_cache_max_age: int = Field(default=3600, alias="HTTP_CACHE_MAX_AGE")
+
+    mvg_cache_ttl: float = Field(default=60, alias="MVG_CACHE_TTL")
+    ticker_cache_size: int = Field(default=256, alias="TICKER_CACHE_SIZE")
+    slim_min_interval: float = Field(default=2, alias="SLIM_MIN_INTERVAL")
+    slim_max_interval: float = Field(default=30, alias="SLIM_MAX_INTERVAL")
+    slim_quiet_interval: float = Field(default=120, alias="SLIM_QUIET_INTERVAL")
+    slim_quiet_start: time = Field(default=time(1), alias="SLIM_QUIET_START")
+    slim_quiet_end: time = Field(default=time(5), alias="SLIM_QUIET_END")
+    slim_timezone: str = Field(default="Europe/Berlin", alias="SLIM_TIMEZONE")
 
     command_prefix: str = Field(default="!", alias="COMMAND_PREFIX")
 
@@ -1,5 +1,23 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import registry
 
 mapper_registry = registry()
-engine = create_engine("sqlite+pysqlite:///config/database.db", future=True)
+engine = create_async_engine("sqlite+aiosqlite:///config/database.db")
+# every operation opens its own short-lived session, objects stay usable after the commit
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """
+    WAL lets readers run concurrently with the writer, the busy timeout makes a
+    connection wait for a lock instead of failing with "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
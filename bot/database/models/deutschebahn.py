@@ -1,4 +1,17 @@
-from sqlalchemy import String, Boolean, Float, Integer
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import (
+    JSON,
+    String,
+    Boolean,
+    Float,
+    Integer,
+    Date,
+    DateTime,
+    ForeignKey,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 
 
@@ -6,15 +19,39 @@ class Base(DeclarativeBase):  # pylint: disable=too-few-public-methods
     pass
 
 
-class StationOfTheDay(Base):
+class Country(Base):
+    __tablename__ = "countries"
+
+    code: Mapped[str] = mapped_column(String, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    active: Mapped[bool] = mapped_column(Boolean)
+
+    def __repr__(self):
+        return f"Country(code={self.code}, name={self.name}, active={self.active})"
+
+
+class StationOfTheDay(Base):  # pylint: disable=too-many-instance-attributes
+    """
+    Local copy of a railway station with photos, synced from the railway-stations api.
+    pk is a surrogate key without gaps, apart from deleted stations, so a random station can be
+    picked with a lookup in the primary key index.
+    """
+
     __tablename__ = "stations"
 
-    country: Mapped[str] = mapped_column(String)
-    id: Mapped[str] = mapped_column(String, primary_key=True)
+    pk: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    country: Mapped[str] = mapped_column(String, ForeignKey("countries.code"))
+    id: Mapped[str] = mapped_column(String)
     inactive: Mapped[bool] = mapped_column(Boolean)
     lat: Mapped[float] = mapped_column(Float)
     lon: Mapped[float] = mapped_column(Float)
     title: Mapped[str] = mapped_column(String)
+    short_code: Mapped[str | None] = mapped_column(String, nullable=True)
+    # grid cell of the coordinate, see bot.cogs.deutschebahn.geo
+    cell: Mapped[int] = mapped_column(Integer, index=True)
+    synced: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (UniqueConstraint("country", "id"),)
 
     def __repr__(self):
         return (
@@ -23,6 +60,25 @@ class StationOfTheDay(Base):
         )
 
 
+class StationPhoto(Base):
+    __tablename__ = "photos"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    station_pk: Mapped[int] = mapped_column(
+        Integer, ForeignKey("stations.pk"), index=True
+    )
+    position: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[int] = mapped_column(Integer)
+    license: Mapped[str] = mapped_column(String)
+    path: Mapped[str] = mapped_column(String)
+    photographer: Mapped[str] = mapped_column(String)
+    outdated: Mapped[bool] = mapped_column(Boolean)
+    synced: Mapped[datetime] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return f"StationPhoto(id={self.id}, station_pk={self.station_pk}, path={self.path})"
+
+
 class RegisteredChannels(Base):
     __tablename__ = "channels"
 
@@ -30,3 +86,43 @@ class RegisteredChannels(Base):
 
     def __repr__(self):
         return f"RegisteredChannels(id={self.id})"
+
+
+class PhotoFeedChannels(Base):
+    __tablename__ = "photo_feed_channels"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    def __repr__(self):
+        return f"PhotoFeedChannels(id={self.id})"
+
+
+class FeedMark(Base):
+    """
+    High-water mark of a feed, the createdAt and id of the newest photo that was posted
+    """
+
+    __tablename__ = "feed_marks"
+
+    feed: Mapped[str] = mapped_column(String, primary_key=True)
+    created_at: Mapped[int] = mapped_column(Integer)
+    photo_id: Mapped[int] = mapped_column(Integer)
+
+    def __repr__(self):
+        return f"FeedMark(feed={self.feed}, created_at={self.created_at}, photo_id={self.photo_id})"
+
+
+class StationPost(Base):
+    """
+    Station of the Day message rendered ahead of the day it is posted on
+    """
+
+    __tablename__ = "station_posts"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # dicts of the station embed followed by the photo embeds
+    embeds: Mapped[List[Dict[str, Any]]] = mapped_column(JSON)
+    rendered: Mapped[datetime] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return f"StationPost(day={self.day}, rendered={self.rendered})"
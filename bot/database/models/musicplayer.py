@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import Integer, String, DateTime
+from sqlalchemy import Integer, String, Date, DateTime, Float, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 
 
@@ -17,8 +17,115 @@ class SongRequest(Base):
     server_id: Mapped[str] = mapped_column(String)
     date: Mapped[datetime] = mapped_column(DateTime)
 
+    __table_args__ = (
+        Index("ix_songrequest_server_id_date", "server_id", "date"),
+        Index("ix_songrequest_requester_id", "requester_id"),
+    )
+
     def __repr__(self):
         return (
             f"SongRequest(id={self.id!r}, title={self.title!r}, web_page={self.web_page!r},"
             f" requester={self.requester_id!r}, server_id={self.server_id!r}, date={self.date!r})"
         )
+
+
+class DailyPlays(Base):
+    """
+    Number of requests of a track by a requester in a guild per day
+    """
+
+    __tablename__ = "dailyplays"
+    server_id: Mapped[str] = mapped_column(String, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    web_page: Mapped[str] = mapped_column(String, primary_key=True)
+    requester_id: Mapped[str] = mapped_column(String, primary_key=True)
+    title: Mapped[str] = mapped_column(String)
+    plays: Mapped[int] = mapped_column(Integer)
+
+    __table_args__ = (
+        Index(
+            "ix_dailyplays_server_id_requester_id_day",
+            "server_id",
+            "requester_id",
+            "day",
+        ),
+    )
+
+    def __repr__(self):
+        return (
+            f"DailyPlays(server_id={self.server_id!r}, day={self.day!r}, web_page={self.web_page!r},"
+            f" requester_id={self.requester_id!r}, plays={self.plays!r})"
+        )
+
+
+class TrackPlays(Base):
+    """
+    Number of requests of a track in a guild
+    """
+
+    __tablename__ = "trackplays"
+    server_id: Mapped[str] = mapped_column(String, primary_key=True)
+    web_page: Mapped[str] = mapped_column(String, primary_key=True)
+    title: Mapped[str] = mapped_column(String)
+    plays: Mapped[int] = mapped_column(Integer)
+    last_played: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (Index("ix_trackplays_server_id_plays", "server_id", "plays"),)
+
+    def __repr__(self):
+        return f"TrackPlays(server_id={self.server_id!r}, web_page={self.web_page!r}, plays={self.plays!r})"
+
+
+class UserPlays(Base):
+    """
+    Number of requests of a requester in a guild
+    """
+
+    __tablename__ = "userplays"
+    server_id: Mapped[str] = mapped_column(String, primary_key=True)
+    requester_id: Mapped[str] = mapped_column(String, primary_key=True)
+    plays: Mapped[int] = mapped_column(Integer)
+    first_played: Mapped[datetime] = mapped_column(DateTime)
+    last_played: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (Index("ix_userplays_server_id_plays", "server_id", "plays"),)
+
+    def __repr__(self):
+        return f"UserPlays(server_id={self.server_id!r}, requester_id={self.requester_id!r}, plays={self.plays!r})"
+
+
+class TrackInfo(Base):
+    __tablename__ = "trackinfo"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    entries: Mapped[str] = mapped_column(Text)
+    updated: Mapped[datetime] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return f"TrackInfo(key={self.key!r}, updated={self.updated!r})"
+
+
+class StreamUrl(Base):
+    __tablename__ = "streamurl"
+    web_page: Mapped[str] = mapped_column(String, primary_key=True)
+    url: Mapped[str] = mapped_column(String)
+    expires: Mapped[float | None] = mapped_column(Float, nullable=True)
+    codec: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    def __repr__(self):
+        return f"StreamUrl(web_page={self.web_page!r}, expires={self.expires!r})"
+
+
+class OfflineTrack(Base):
+    __tablename__ = "offlinetrack"
+    web_page: Mapped[str] = mapped_column(String, primary_key=True)
+    filename: Mapped[str] = mapped_column(String)
+    codec: Mapped[str | None] = mapped_column(String, nullable=True)
+    size: Mapped[int] = mapped_column(Integer)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    last_used: Mapped[datetime] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return (
+            f"OfflineTrack(web_page={self.web_page!r}, filename={self.filename!r}, size={self.size!r},"
+            f" hits={self.hits!r}, last_used={self.last_used!r})"
+        )
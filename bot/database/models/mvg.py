@@ -1,4 +1,4 @@
-from sqlalchemy import Integer
+from sqlalchemy import Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 
 
@@ -11,6 +11,8 @@ class RegisteredChannelWithMessageId(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     message_id: Mapped[int] = mapped_column(Integer)
+    # hash of the content of the slim embed in the message, see bot.cogs.mvg.mvg_cog.slim_hash
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)
 
     def __repr__(self):
         return f"RegisteredChannelWithMessageId(id={self.id}, message_id={self.message_id})"
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.database import async_session
+from bot.logger import logger
+from bot.metrics import Metric
+
+
+class BatchWriter:
+    """
+    Buffers rows and inserts them in bulk, every batch_size rows or after interval seconds.
+    """
+
+    __slots__ = (
+        "name",
+        "rows",
+        "batch_size",
+        "interval",
+        "wakeup",
+        "lock",
+        "task",
+        "latency",
+        "on_flush",
+    )
+    name: str
+    rows: List[object]
+    batch_size: int
+    interval: float
+    wakeup: asyncio.Event
+    lock: asyncio.Lock
+    task: asyncio.Task | None
+    latency: Metric
+    on_flush: Callable[[AsyncSession, List[object]], Awaitable[None]] | None
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int,
+        interval: float,
+        on_flush: Callable[[AsyncSession, List[object]], Awaitable[None]] | None = None,
+    ):
+        """
+        :param name: used in the logs
+        :param batch_size: number of rows that trigger a flush
+        :param interval: seconds after which buffered rows get flushed
+        :param on_flush: called with the session and the rows before the commit, to update derived tables
+        """
+        self.name = name
+        self.rows = []
+        self.batch_size = batch_size
+        self.interval = interval
+        self.wakeup = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.latency = Metric(f"{name} flush latency")
+        self.on_flush = on_flush
+
+    @property
+    def depth(self) -> int:
+        return len(self.rows)
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def add(self, row: object):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.wakeup.set()
+
+    async def flush(self):
+        async with self.lock:
+            if not self.rows:
+                return
+            rows, self.rows = self.rows, []
+            start = time.perf_counter()
+            try:
+                async with async_session() as session:
+                    session.add_all(rows)
+                    if self.on_flush is not None:
+                        await self.on_flush(session, rows)
+                    await session.commit()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"{self.name}: writing {len(rows)} rows failed: {e}")
+                self.rows[:0] = rows
+                return
+            self.latency.record(time.perf_counter() - start)
+            logger.info(
+                f"{self.name}: wrote {len(rows)} rows, {self.depth} queued ({self.latency.summary()})"
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def close(self):
+        """
+        Stop the background flushing and write the remaining rows
+        """
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
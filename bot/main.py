@@ -1,10 +1,13 @@
 import asyncio
+import contextlib
 import logging
 import os
+import signal
 import discord
 from discord.ext import commands
 
 from bot.config import config
+from bot.database.database import engine
 from bot.logger import logger
 
 discord.utils.setup_logging(level=logging.INFO, root=True)
@@ -22,14 +25,23 @@ async def on_ready():
 
 
 async def main():
+    # docker stop sends SIGTERM, close the client so the cogs can write their buffered data
+    with contextlib.suppress(NotImplementedError):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, lambda: client.loop.create_task(client.close())
+        )
     for extension in [
         "bot.cogs.music.music_cog",
+        "bot.cogs.music.statistics_cog",
         "bot.cogs.deutschebahn.deutschebahn_cog",
         "bot.cogs.mvg.mvg_cog",
     ]:
         await client.load_extension(extension)
         logger.info(f"loaded extension: {extension}")
-    await client.start(TOKEN)
+    try:
+        await client.start(TOKEN)
+    finally:
+        await engine.dispose()
 
 
 if __name__ == "__main__":
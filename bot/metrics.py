@@ -0,0 +1,53 @@
+from collections import deque
+from typing import Deque
+
+
+class Metric:
+    """
+    Keeps the last measurements of a value, like a latency in seconds, to report percentiles
+    """
+
+    __slots__ = ("name", "values", "count", "total")
+    name: str
+    values: Deque[float]
+    count: int
+    total: float
+
+    def __init__(self, name: str, window: int = 500):
+        self.name = name
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value: float):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float | None:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent: float) -> float | None:
+        """
+        Percentile over the measurements in the window
+        :param percent: between 0 and 100
+        :return:
+        """
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+        return ordered[index]
+
+    def summary(self, unit: str = "ms", scale: float = 1000) -> str:
+        if self.count == 0:
+            return f"{self.name}: no data"
+        return (
+            f"{self.name}: n={self.count} avg={self.mean * scale:.1f}{unit}"
+            f" p50={self.percentile(50) * scale:.1f}{unit}"
+            f" p95={self.percentile(95) * scale:.1f}{unit}"
+            f" max={max(self.values) * scale:.1f}{unit}"
+        )